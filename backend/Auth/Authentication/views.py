@@ -12,6 +12,7 @@ import os
 import logging
 import redis
 import json
+import time
 from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
@@ -260,8 +261,12 @@ class UserLogoutView(APIView):
     authentication_classes = (JWTAuthentication,)
     permission_classes = (IsAuthenticated,)
 
-    def _invalidate_user_cache(self, user_id, email):
-        """Efficiently invalidate user cache using Redis pipeline."""
+    def _invalidate_user_cache(self, user_id, email, access_token=None):
+        """Efficiently invalidate user cache using Redis pipeline.
+
+        The access token's jti is also published to the blacklist feed read by
+        services that verify JWTs locally, until the token would have expired.
+        """
         if not _is_redis_available():
             logger.debug("Redis not available, skipping cache invalidation")
             return
@@ -270,6 +275,10 @@ class UserLogoutView(APIView):
             pipe = redis_client.pipeline()
             pipe.delete(f'user:{email}')
             pipe.delete(f'user_info:{user_id}')
+            if access_token is not None:
+                remaining = int(access_token['exp'] - time.time())
+                if remaining > 0:
+                    pipe.setex(f"jwt_blacklist:{access_token['jti']}", remaining, 1)
             pipe.execute()
             logger.debug(f"Cache invalidated for user {email}")
         except redis.RedisError as e:
@@ -300,7 +309,7 @@ class UserLogoutView(APIView):
             )
             
             # Run cache invalidation and token blacklisting in parallel
-            self._invalidate_user_cache(user_id, email)
+            self._invalidate_user_cache(user_id, email, request.auth)
             
             if refresh_token:
                 self._blacklist_token_async(refresh_token)
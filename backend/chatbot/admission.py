@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import math
+import os
+import time
+
+from dotenv import load_dotenv
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+# Per-user token bucket: sustained chats per minute and burst size
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", 20))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", 5))
+# Concurrent LLM generations allowed per chat service process
+MAX_INFLIGHT_GENERATIONS = int(os.getenv("MAX_INFLIGHT_GENERATIONS", 32))
+# Longest a request may wait for a token or a generation slot before it is rejected with 429
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", 2.0))
+
+# Refill and take one token atomically; uses the Redis clock so replicas agree on time.
+# Returns {allowed, seconds until a token is available}.
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionSlot:
+    """A held generation slot; `release` is idempotent so every exit path can call it."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self.controller = controller
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller._release()
+
+
+class AdmissionController:
+    """
+    Admission control for chat generations.
+
+    Each request takes a token from the user's bucket in Redis (shared by all
+    replicas) and then one of `max_inflight` generation slots of this process.
+    Either may be waited for up to `max_wait` seconds; beyond that the request is
+    rejected with the time after which a retry can succeed. Redis errors fail open.
+    """
+
+    def __init__(self, redis_client: Redis, rate_per_minute: float = RATE_LIMIT_PER_MINUTE,
+                 burst: int = RATE_LIMIT_BURST, max_inflight: int = MAX_INFLIGHT_GENERATIONS,
+                 max_wait: float = ADMISSION_MAX_WAIT, key_prefix: str = "chat_rate:"):
+        self.redis = redis_client
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_inflight = max_inflight
+        self.max_wait = max_wait
+        self.key_prefix = key_prefix
+        self._bucket = redis_client.register_script(TOKEN_BUCKET_LUA)
+        self._slots = asyncio.Semaphore(max_inflight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.overloaded = 0
+        self.total_wait = 0.0
+
+    async def _take_token(self, user_id: str) -> float:
+        """Take a token from the user's bucket; returns 0 on success or the seconds until one is available."""
+        try:
+            allowed, retry_after = await self._bucket(
+                keys=[f"{self.key_prefix}{user_id}"], args=[self.burst, self.rate]
+            )
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, admitting request: {e}")
+            return 0.0
+        return 0.0 if int(allowed) else float(retry_after)
+
+    async def admit(self, user_id: str) -> AdmissionSlot:
+        """Wait (briefly) for the user's rate limit and a free generation slot.
+
+        Raises AdmissionRejected when either would take longer than `max_wait`.
+        """
+        start = time.monotonic()
+        retry_after = await self._take_token(user_id)
+        if retry_after > 0:
+            if retry_after > self.max_wait:
+                self.rate_limited += 1
+                raise AdmissionRejected("rate_limited", retry_after)
+            await asyncio.sleep(retry_after)
+            retry_after = await self._take_token(user_id)
+            if retry_after > 0:
+                self.rate_limited += 1
+                raise AdmissionRejected("rate_limited", retry_after)
+
+        if self._slots.locked():
+            remaining = self.max_wait - (time.monotonic() - start)
+            self.waiting += 1
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                await asyncio.wait_for(self._slots.acquire(), remaining)
+            except asyncio.TimeoutError:
+                self.overloaded += 1
+                raise AdmissionRejected("overloaded", self.max_wait)
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        self.in_flight += 1
+        self.admitted += 1
+        self.total_wait += time.monotonic() - start
+        return AdmissionSlot(self)
+
+    def _release(self):
+        self.in_flight -= 1
+        self._slots.release()
+
+    @staticmethod
+    def retry_after_header(rejection: AdmissionRejected) -> str:
+        return str(max(1, math.ceil(rejection.retry_after)))
+
+    def metrics(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_inflight": self.max_inflight,
+            "utilization": self.in_flight / self.max_inflight if self.max_inflight else 0.0,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected_rate_limited": self.rate_limited,
+            "rejected_overloaded": self.overloaded,
+            "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 2) if self.admitted else 0.0,
+        }
@@ -0,0 +1,114 @@
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import jwt
+from redis.asyncio import Redis
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+# Configuration (mirrors SIMPLE_JWT in the Auth service settings)
+JWT_SIGNING_KEY = os.getenv("JWT_SIGNING_KEY")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+JWT_USER_ID_CLAIM = os.getenv("JWT_USER_ID_CLAIM", "user_id")
+JWT_TOKEN_TYPE = "access"
+AUTH_MODE = os.getenv("AUTH_MODE", "local" if JWT_SIGNING_KEY else "remote")
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", 60))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 10000))
+AUTH_BLACKLIST_ENABLED = os.getenv("AUTH_BLACKLIST_ENABLED", "true").lower() == "true"
+BLACKLIST_KEY_PREFIX = "jwt_blacklist:"
+
+
+class InvalidToken(Exception):
+    """Raised when a token fails local verification."""
+
+
+class LocalTokenVerifier:
+    """
+    Verify SimpleJWT access tokens in-process instead of calling the Auth service.
+
+    Validated payloads are cached by token hash for a short TTL (never past the
+    token's own expiry), so repeated requests skip both the signature check and
+    the optional Redis blacklist lookup.
+    """
+
+    def __init__(self, signing_key: str, algorithm: str = JWT_ALGORITHM,
+                 cache_ttl: int = AUTH_CACHE_TTL, cache_size: int = AUTH_CACHE_SIZE,
+                 redis_client: Optional[Redis] = None):
+        self.signing_key = signing_key
+        self.algorithm = algorithm
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._redis = redis_client
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[dict]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, user_info = entry
+        if expires_at <= time.time():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return user_info
+
+    def _cache_set(self, key: str, user_info: dict, token_exp: float):
+        expires_at = min(time.time() + self.cache_ttl, token_exp)
+        self._cache[key] = (expires_at, user_info)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _is_blacklisted(self, jti: Optional[str]) -> bool:
+        """Check the Redis blacklist feed written by the Auth service on logout."""
+        if not self._redis or not jti:
+            return False
+        try:
+            return bool(await self._redis.exists(f"{BLACKLIST_KEY_PREFIX}{jti}"))
+        except Exception as e:
+            # Blacklist is best-effort; an unavailable Redis must not block chat
+            logger.warning(f"Blacklist lookup failed, skipping: {e}")
+            return False
+
+    def decode(self, token: str) -> dict:
+        """Validate signature, expiry, token type and user claim; return the claims."""
+        try:
+            claims = jwt.decode(
+                token,
+                self.signing_key,
+                algorithms=[self.algorithm],
+                options={"require": ["exp", JWT_USER_ID_CLAIM]},
+            )
+        except jwt.PyJWTError as e:
+            raise InvalidToken(str(e)) from e
+        if claims.get("token_type") != JWT_TOKEN_TYPE:
+            raise InvalidToken("Token is not an access token")
+        return claims
+
+    async def verify(self, token: str) -> dict:
+        """Return a user info payload shaped like the Auth service's /auth/status/ response."""
+        key = self._token_key(token)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        claims = self.decode(token)
+        if await self._is_blacklisted(claims.get("jti")):
+            raise InvalidToken("Token has been revoked")
+
+        user_info = {
+            "authenticated": True,
+            "user": {"id": claims[JWT_USER_ID_CLAIM], "email": claims.get("email")},
+        }
+        self._cache_set(key, user_info, float(claims["exp"]))
+        return user_info
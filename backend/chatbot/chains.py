@@ -0,0 +1,76 @@
+import logging
+import os
+from typing import Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+from langchain_core.prompts import (
+    ChatPromptTemplate,
+    SystemMessagePromptTemplate,
+    HumanMessagePromptTemplate,
+    MessagesPlaceholder,
+)
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable
+
+from prompts.loader import PromptLoader
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+GITHUB_ENDPOINT = "https://models.github.ai/inference"
+GITHUB_MODEL = "openai/gpt-4.1"
+DEFAULT_ROLE = "default"
+
+
+class ChainRegistry:
+    """
+    Per-role LangChain pipelines built once and reused for every request.
+
+    The system prompt is escaped and parsed a single time per role; retrieved
+    context, conversation history and the user input are template variables.
+    All chains share one ChatOpenAI client and therefore one connection pool.
+    """
+
+    def __init__(self, prompt_loader: PromptLoader):
+        self.prompt_loader = prompt_loader
+        self.llm: Optional[ChatOpenAI] = None
+        self._chains: Dict[str, Runnable] = {}
+
+    def build(self, http_client: Optional[httpx.AsyncClient] = None):
+        """Create the shared LLM client and compile a chain for every available prompt."""
+        self.llm = ChatOpenAI(
+            base_url=GITHUB_ENDPOINT,
+            api_key=GITHUB_TOKEN,
+            model=GITHUB_MODEL,
+            temperature=1.0,
+            top_p=1.0,
+            http_async_client=http_client,
+        )
+        self._chains = {}
+        for role in self.prompt_loader.get_available_prompts():
+            self._chains[role] = self._build_chain(role)
+        logger.info(f"Built LLM chains for roles: {sorted(self._chains)}")
+
+    def _build_chain(self, role: str) -> Runnable:
+        system_prompt = self.prompt_loader.load_prompts(role)
+        # Escape braces to avoid format string errors
+        escaped_prompt = system_prompt.replace('{', '{{').replace('}', '}}')
+        prompt = ChatPromptTemplate.from_messages([
+            SystemMessagePromptTemplate.from_template(escaped_prompt + "\n\nRelevant context:\n{context}"),
+            MessagesPlaceholder("history", optional=True),
+            HumanMessagePromptTemplate.from_template("{input}")
+        ])
+        return prompt | self.llm | StrOutputParser()
+
+    def get(self, role: str = DEFAULT_ROLE) -> Runnable:
+        """Return the chain for a role, falling back to the default prompt."""
+        if self.llm is None:
+            self.build()
+        chain = self._chains.get(role)
+        if chain is None:
+            logger.warning(f"Prompt for role '{role}' not found, falling back to default")
+            chain = self._chains[DEFAULT_ROLE]
+        return chain
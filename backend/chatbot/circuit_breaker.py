@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitBreaker:
+    """
+    Latency-aware circuit breaker over a rolling time window.
+
+    Calls are recorded with their outcome and latency. Once the window holds at least
+    `min_calls`, the circuit opens when either the error rate or the share of calls
+    slower than `slow_call_seconds` reaches its threshold. While open, `allow()`
+    rejects immediately so callers fall back without waiting; after `open_seconds`
+    a single probe is let through (half-open) and its result closes or re-opens the
+    circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, window_seconds: float = 30.0, min_calls: int = 10,
+                 failure_rate_threshold: float = 0.5, slow_call_seconds: float = 1.0,
+                 slow_rate_threshold: float = 0.5, open_seconds: float = 15.0):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate_threshold = slow_rate_threshold
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self._calls: "deque[tuple]" = deque()  # (finished_at, ok, latency)
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self.successes = 0
+        self.failures = 0
+        self.rejections = 0
+        self.opens = 0
+        self.hedges = 0
+
+    def _prune(self, now: float):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _rates(self):
+        total = len(self._calls)
+        if not total:
+            return 0.0, 0.0
+        failed = sum(1 for _, ok, _ in self._calls if not ok)
+        slow = sum(1 for _, _, latency in self._calls if latency >= self.slow_call_seconds)
+        return failed / total, slow / total
+
+    def _trip(self, now: float):
+        if self.state != self.OPEN:
+            self.opens += 1
+            logger.warning(f"Circuit '{self.name}' opened")
+        self.state = self.OPEN
+        self._opened_at = now
+        self._probe_started = None
+
+    def allow(self) -> bool:
+        """Whether a call may proceed now; False means use the fallback."""
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self._opened_at < self.open_seconds:
+                self.rejections += 1
+                return False
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            # One probe at a time; a probe that never reported (e.g. cancelled) expires
+            if self._probe_started is not None and now - self._probe_started < self.open_seconds:
+                self.rejections += 1
+                return False
+            self._probe_started = now
+        return True
+
+    def record(self, ok: bool, latency: float):
+        now = time.monotonic()
+        if ok:
+            self.successes += 1
+        else:
+            self.failures += 1
+        healthy = ok and latency < self.slow_call_seconds
+        if self.state == self.HALF_OPEN:
+            if healthy:
+                self.state = self.CLOSED
+                self._calls.clear()
+                self._probe_started = None
+                logger.info(f"Circuit '{self.name}' closed")
+            else:
+                self._trip(now)
+            return
+        if self.state == self.OPEN:
+            return
+        self._calls.append((now, ok, latency))
+        self._prune(now)
+        if len(self._calls) >= self.min_calls:
+            failure_rate, slow_rate = self._rates()
+            if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_rate_threshold:
+                self._trip(now)
+
+    async def hedged(self, make_call: Callable[[], Awaitable[T]], delay: float) -> T:
+        """Run `make_call`; if it has not finished after `delay` seconds, race a second copy.
+
+        The first successful result wins and the other attempt is cancelled. `delay <= 0`
+        disables hedging.
+        """
+        first = asyncio.ensure_future(make_call())
+        tasks = {first}
+        try:
+            if delay <= 0 or self.state != self.CLOSED:
+                return await first
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedges += 1
+                tasks.add(asyncio.ensure_future(make_call()))
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def metrics(self) -> dict:
+        self._prune(time.monotonic())
+        failure_rate, slow_rate = self._rates()
+        return {
+            "state": self.state,
+            "window_calls": len(self._calls),
+            "failure_rate": round(failure_rate, 4),
+            "slow_rate": round(slow_rate, 4),
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejections": self.rejections,
+            "opens": self.opens,
+            "hedges": self.hedges,
+        }
@@ -0,0 +1,93 @@
+import json
+import logging
+import os
+from typing import List, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+HISTORY_TTL = int(os.getenv("HISTORY_TTL", 86400))
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", 100))
+
+# Messages at positions [ARGV[1], ARGV[2]) that are still stored; the list holds the last
+# LLEN of COUNT messages ever appended. Atomic, so concurrent appends cannot shift the slice.
+RANGE_BY_POSITION_LUA = """
+local count = tonumber(redis.call('GET', KEYS[2]) or '0')
+local first = count - redis.call('LLEN', KEYS[1])
+local lo = math.max(tonumber(ARGV[1]), first) - first
+local hi = tonumber(ARGV[2]) - 1 - first
+if hi < lo then
+    return {}
+end
+return redis.call('LRANGE', KEYS[1], lo, hi)
+"""
+
+
+class RedisHistoryStore:
+    """
+    Async chat history kept as one Redis list per session.
+
+    Reads fetch only the last N entries with LRANGE, so their cost does not grow
+    with conversation length. Appends RPUSH, LTRIM to HISTORY_MAX_MESSAGES and
+    refresh the TTL in a single pipelined round-trip. A per-session counter of all
+    messages ever appended gives each message a stable position that survives trimming.
+    """
+
+    def __init__(self, redis_client: Redis, key_prefix: str = "chat_history:",
+                 ttl: int = HISTORY_TTL, max_messages: int = HISTORY_MAX_MESSAGES):
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self._range_by_position = redis_client.register_script(RANGE_BY_POSITION_LUA)
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{session_id}"
+
+    def _count_key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{session_id}:count"
+
+    async def recent(self, session_id: str, limit: int) -> List[BaseMessage]:
+        """Return up to `limit` most recent messages, oldest first."""
+        if limit <= 0:
+            return []
+        raw = await self.redis.lrange(self._key(session_id), -limit, -1)
+        return messages_from_dict([json.loads(item) for item in raw])
+
+    async def recent_window(self, session_id: str, limit: int) -> Tuple[int, List[BaseMessage]]:
+        """Like `recent`, but also return the position of the first message in the session."""
+        if limit <= 0:
+            return 0, []
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrange(self._key(session_id), -limit, -1)
+            pipe.get(self._count_key(session_id))
+            raw, count = await pipe.execute()
+        messages = messages_from_dict([json.loads(item) for item in raw])
+        return max(int(count or 0) - len(messages), 0), messages
+
+    async def range(self, session_id: str, start: int, end: int) -> List[BaseMessage]:
+        """Messages at positions [start, end), oldest first; positions already trimmed are skipped."""
+        if end <= start:
+            return []
+        raw = await self._range_by_position(
+            keys=[self._key(session_id), self._count_key(session_id)], args=[start, end]
+        )
+        return messages_from_dict([json.loads(item) for item in raw])
+
+    async def append(self, session_id: str, *messages: BaseMessage):
+        if not messages:
+            return
+        key = self._key(session_id)
+        count_key = self._count_key(session_id)
+        # Transactional so the counter always matches the list, even with concurrent appends
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, *(json.dumps(message_to_dict(message)) for message in messages))
+            pipe.incrby(count_key, len(messages))
+            pipe.ltrim(key, -self.max_messages, -1)
+            pipe.expire(key, self.ttl)
+            pipe.expire(count_key, self.ttl)
+            await pipe.execute()
@@ -0,0 +1,76 @@
+import importlib.util
+import logging
+import os
+from typing import Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+# Pool configuration
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", 5))
+# HTTP/2 needs the optional `h2` package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Per-upstream timeouts in seconds: (connect, read)
+UPSTREAM_TIMEOUTS = {
+    "auth": (float(os.getenv("AUTH_CONNECT_TIMEOUT", 2)), float(os.getenv("AUTH_TIMEOUT", 5))),
+    "vector": (float(os.getenv("VECTOR_CONNECT_TIMEOUT", 2)), float(os.getenv("VECTOR_SERVICE_TIMEOUT", 10))),
+    "llm": (float(os.getenv("LLM_CONNECT_TIMEOUT", 5)), float(os.getenv("LLM_TIMEOUT", 60))),
+}
+
+
+class UpstreamClients:
+    """
+    One long-lived, keep-alive httpx.AsyncClient per upstream service.
+
+    Opened in the application lifespan and shared by all requests, so TCP/TLS
+    setup is paid once per pooled connection instead of once per call.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def open(self):
+        limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        for name, (connect_timeout, read_timeout) in UPSTREAM_TIMEOUTS.items():
+            timeout = httpx.Timeout(read_timeout, connect=connect_timeout, pool=HTTP_POOL_TIMEOUT)
+            self._clients[name] = httpx.AsyncClient(limits=limits, timeout=timeout, http2=HTTP2_AVAILABLE)
+        logger.info(f"Opened HTTP client pools for {list(self._clients)} (http2={HTTP2_AVAILABLE})")
+
+    async def close(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Return the pooled client for an upstream, opening the pools lazily if needed."""
+        if not self._clients:
+            self.open()
+        return self._clients[name]
+
+    @staticmethod
+    def _pool_stats(client: httpx.AsyncClient) -> Optional[dict]:
+        # httpx does not expose pool state publicly; read it from the httpcore pool
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        if pool is None:
+            return None
+        connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for conn in connections if conn.is_idle())
+        waiting = sum(1 for req in getattr(pool, "_requests", []) if req.is_queued())
+        return {"in_use": len(connections) - idle, "idle": idle, "waiting": waiting}
+
+    def metrics(self) -> dict:
+        return {name: self._pool_stats(client) for name, client in self._clients.items()}
+
+
+upstream_clients = UpstreamClients()
@@ -1,8 +1,26 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from chat_router import router
+from chat_router import router, chain_registry, interaction_publisher, history_summarizer, semantic_cache, vector_breaker, admission
+from http_clients import upstream_clients
+from redis_pool import close_redis
+from stages import stage_stats
+from streaming import stream_stats
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    upstream_clients.open()
+    chain_registry.build(upstream_clients.get("llm"))
+    if history_summarizer is not None:
+        history_summarizer.llm = chain_registry.llm
+    interaction_publisher.start()
+    yield
+    await interaction_publisher.close()
+    await upstream_clients.close()
+    await close_redis()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,3 +35,15 @@ app.include_router(router, prefix="/api")
 @app.get("/ping")
 def ping():
     return {"message" : "pong" }
+
+@app.get("/metrics")
+def metrics():
+    return {
+        "http_pools": upstream_clients.metrics(),
+        "admission": admission.metrics(),
+        "publisher": interaction_publisher.metrics(),
+        "stages": stage_stats.metrics(),
+        "streams": stream_stats.metrics(),
+        "vector_breaker": vector_breaker.metrics(),
+        "semantic_cache": semantic_cache.metrics() if semantic_cache is not None else None,
+    }
@@ -0,0 +1,213 @@
+import json
+import logging
+import math
+import os
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import tiktoken
+from dotenv import load_dotenv
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from redis.asyncio import Redis
+
+from chains import GITHUB_MODEL
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", 4000))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 50000))
+# Share of MAX_CONTEXT_TOKENS reserved for retrieved context
+MAX_RETRIEVAL_TOKENS = int(os.getenv("MAX_RETRIEVAL_TOKENS", 1500))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", 0.9))
+# Token estimate used when the tokenizer cannot be loaded
+APPROX_CHARS_PER_TOKEN = 4
+# Role/formatting overhead per chat message in the OpenAI wire format
+MESSAGE_TOKEN_OVERHEAD = 4
+# Context placeholder when retrieval found nothing usable
+NO_CONTEXT = "No relevant history found"
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> Optional[tiktoken.Encoding]:
+    """The model's tokenizer, or None when its encoding file cannot be loaded.
+
+    tiktoken downloads encodings on first use unless TIKTOKEN_CACHE_DIR holds them
+    (the Docker image pre-fetches them there).
+    """
+    try:
+        try:
+            return tiktoken.encoding_for_model(GITHUB_MODEL.split("/")[-1])
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"Tokenizer unavailable, approximating token counts: {e}")
+        return None
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def count_tokens(text: str) -> int:
+    """Count tokens with the model's tokenizer; cached so each message is encoded once.
+
+    Without the tokenizer, falls back to roughly four characters per token.
+    """
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / APPROX_CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    return count_tokens(content) + MESSAGE_TOKEN_OVERHEAD
+
+
+def pack_history(messages: List[BaseMessage], budget: int) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+    """Keep the newest messages that fit in `budget` tokens, evicting oldest first.
+
+    Returns (kept, evicted), both in chronological order.
+    """
+    used = 0
+    cut = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        cost = message_tokens(messages[i])
+        if used + cost > budget:
+            break
+        used += cost
+        cut = i
+    return messages[cut:], messages[:cut]
+
+
+def _normalized_words(text: str) -> frozenset:
+    return frozenset(re.findall(r"\w+", text.lower()))
+
+
+def _is_near_duplicate(words: frozenset, seen: List[frozenset], threshold: float) -> bool:
+    for other in seen:
+        union = len(words | other)
+        if union and len(words & other) / union >= threshold:
+            return True
+    return False
+
+
+def build_context(docs: list, budget: int = MAX_RETRIEVAL_TOKENS,
+                  dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD) -> str:
+    """Assemble retrieved interactions into a context block that fits in `budget` tokens.
+
+    Expects the vector service's similarity-search items (message, response, score).
+    Hits are taken best score first; near-identical ones (word-set Jaccard similarity
+    at or above `dedup_threshold`) are skipped.
+    """
+    ranked = sorted(docs or [], key=lambda doc: doc.get("score") or 0.0, reverse=True)
+    blocks = []
+    seen: List[frozenset] = []
+    used = 0
+    for doc in ranked:
+        message = (doc.get("message") or "").strip()
+        response = (doc.get("response") or "").strip()
+        if not message and not response:
+            continue
+        block = "\n".join(part for part in (
+            f"User: {message}" if message else "",
+            f"Assistant: {response}" if response else "",
+        ) if part)
+        words = _normalized_words(block)
+        if _is_near_duplicate(words, seen, dedup_threshold):
+            continue
+        cost = count_tokens(block)
+        if used + cost > budget:
+            continue
+        blocks.append(block)
+        seen.append(words)
+        used += cost
+    return "\n\n".join(blocks) if blocks else NO_CONTEXT
+
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You maintain a concise running summary of a conversation between a user and an assistant. "
+               "Merge the new messages into the existing summary. Keep facts, preferences and open questions; "
+               "drop pleasantries. Reply with the updated summary only."),
+    ("human", "Existing summary:\n{summary}\n\nNew messages:\n{messages}"),
+])
+
+
+class HistorySummarizer:
+    """
+    Rolling summary of turns that are no longer in the prompt: evicted from the
+    history budget or slid out of the recent window.
+
+    The summary is stored per session in Redis together with a watermark (the
+    history position just past the last summarized message), so each turn is folded
+    in only once, even when the same content is repeated later. Turns between the
+    watermark and the window are read back from `history_store`. Updates run off the
+    request path; the prompt uses whatever summary exists.
+    """
+
+    def __init__(self, redis_client: Redis, history_store=None, llm: Optional[BaseChatModel] = None,
+                 key_prefix: str = "chat_summary:", ttl: int = 86400, max_tokens: int = 300):
+        self.redis = redis_client
+        self.history_store = history_store
+        self.llm = llm
+        self.key_prefix = key_prefix
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{session_id}"
+
+    async def _load(self, session_id: str) -> dict:
+        raw = await self.redis.get(self._key(session_id))
+        state = json.loads(raw) if raw else {}
+        through = state.get("through")
+        return {"summary": state.get("summary", ""), "through": through if isinstance(through, int) else 0}
+
+    async def summary_message(self, session_id: str) -> Optional[SystemMessage]:
+        try:
+            summary = (await self._load(session_id))["summary"]
+        except Exception as e:
+            logger.warning(f"Failed to load conversation summary: {e}")
+            return None
+        if not summary:
+            return None
+        return SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
+
+    async def update(self, session_id: str, evicted: List[BaseMessage], start: int):
+        """Fold every message before the kept history into the stored summary.
+
+        `start` is the history position of the recent window (and of `evicted[0]`).
+        Messages between the watermark and `start` left the window without being
+        evicted and are loaded from the history store; messages before the watermark
+        are skipped, and nothing is done when none are newer.
+        """
+        end = start + len(evicted)
+        if end == 0 or self.llm is None:
+            return
+        try:
+            state = await self._load(session_id)
+            through = state["through"]
+            if through >= end:
+                return
+            new_messages = []
+            if through < start and self.history_store is not None:
+                new_messages = await self.history_store.range(session_id, through, start)
+            new_messages += evicted[max(through - start, 0):]
+            if not new_messages:
+                # The gap was already trimmed from history; move past it
+                await self.redis.set(
+                    self._key(session_id), json.dumps({"summary": state["summary"], "through": end}), ex=self.ttl
+                )
+                return
+            transcript = "\n".join(f"{message.type}: {message.content}" for message in new_messages)
+            chain = SUMMARY_PROMPT | self.llm.bind(max_tokens=self.max_tokens) | StrOutputParser()
+            summary = await chain.ainvoke({"summary": state["summary"] or "(none)", "messages": transcript})
+            await self.redis.set(
+                self._key(session_id),
+                json.dumps({"summary": summary, "through": end}),
+                ex=self.ttl,
+            )
+        except Exception as e:
+            logger.warning(f"Failed to update conversation summary: {e}")
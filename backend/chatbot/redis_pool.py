@@ -0,0 +1,18 @@
+import os
+
+import redis.asyncio as aioredis
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+
+# One connection pool shared by every Redis user in the chat service
+redis_pool = aioredis.ConnectionPool.from_url(REDIS_URL, max_connections=REDIS_MAX_CONNECTIONS)
+redis_client = aioredis.Redis(connection_pool=redis_pool)
+
+
+async def close_redis():
+    await redis_client.aclose()
+    await redis_pool.disconnect()
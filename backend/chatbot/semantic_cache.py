@@ -0,0 +1,143 @@
+import hashlib
+import logging
+import os
+import re
+import time
+from array import array
+from typing import Callable, List, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from redis.asyncio import Redis
+from redis.commands.search.field import NumericField, TagField, TextField, VectorField
+from redis.commands.search.index_definition import IndexDefinition, IndexType
+from redis.commands.search.query import Query
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+# Minimum cosine similarity between the new prompt and a cached one to reuse its answer
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", 86400))
+# Only cache answers given without any prior turns in the prompt, so they cannot depend on the conversation
+SEMANTIC_CACHE_REQUIRE_EMPTY_HISTORY = os.getenv("SEMANTIC_CACHE_REQUIRE_EMPTY_HISTORY", "true").lower() == "true"
+SEMANTIC_CACHE_INDEX = os.getenv("SEMANTIC_CACHE_INDEX", "Response_Cache")
+
+
+def _escape_tag(value: str) -> str:
+    return re.sub(r"([^\w])", r"\\\1", value)
+
+
+class SemanticResponseCache:
+    """
+    Reuse LLM answers for near-identical prompts.
+
+    Prompts are embedded through the vector service's /embed endpoint and stored
+    with their response as `<prefix><role>:<hash>` hashes that expire after `ttl`.
+    A dedicated Redis vector index answers "closest prompt for this role and
+    embedding model"; a hit above `threshold` returns the stored response. Roles
+    (prompt personas) never share entries.
+    """
+
+    def __init__(self, redis_client: Redis, http_client: Callable[[], httpx.AsyncClient], embed_url: str,
+                 index_name: str = SEMANTIC_CACHE_INDEX, prefix: str = "response_cache:",
+                 threshold: float = SEMANTIC_CACHE_THRESHOLD, ttl: int = SEMANTIC_CACHE_TTL):
+        self.redis = redis_client
+        self.http_client = http_client
+        self.embed_url = embed_url
+        self.index_name = index_name
+        self.prefix = prefix
+        self.threshold = threshold
+        self.ttl = ttl
+        self._index_dim: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+
+    async def _embed(self, text: str) -> Tuple[str, List[float]]:
+        response = await self.http_client().post(self.embed_url, json={"texts": [text], "input_type": "search_query"})
+        response.raise_for_status()
+        body = response.json()
+        return body["model"], body["embeddings"][0]
+
+    async def _ensure_index(self, dim: int):
+        if self._index_dim == dim:
+            return
+        try:
+            await self.redis.ft(self.index_name).info()
+        except Exception:
+            await self.redis.ft(self.index_name).create_index(
+                fields=[
+                    TagField("role"),
+                    TagField("model"),
+                    TextField("prompt"),
+                    TextField("response"),
+                    NumericField("created"),
+                    VectorField("embedding", "HNSW", {"TYPE": "FLOAT32", "DIM": dim, "DISTANCE_METRIC": "COSINE"}),
+                ],
+                definition=IndexDefinition(prefix=[self.prefix], index_type=IndexType.HASH)
+            )
+            logger.info(f"Created semantic cache index {self.index_name} (dim={dim})")
+        self._index_dim = dim
+
+    async def lookup(self, role: str, prompt: str) -> Tuple[Optional[str], Optional[tuple]]:
+        """Return (cached response or None, embedding to pass to `store` on a miss)."""
+        try:
+            model, vector = await self._embed(prompt)
+            await self._ensure_index(len(vector))
+            query = (
+                Query(f"(@role:{{{_escape_tag(role)}}} @model:{{{_escape_tag(model)}}})=>[KNN 1 @embedding $vec AS distance]")
+                .sort_by("distance")
+                .return_fields("response", "distance")
+                .dialect(2)
+            )
+            results = await self.redis.ft(self.index_name).search(
+                query, query_params={"vec": array("f", vector).tobytes()}
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            return None, None
+        embedding = (model, vector)
+        if results.docs:
+            doc = results.docs[0]
+            if 1 - float(doc.distance) >= self.threshold:
+                self.hits += 1
+                response = doc.response
+                return (response.decode() if isinstance(response, bytes) else response), embedding
+        self.misses += 1
+        return None, embedding
+
+    async def store(self, role: str, prompt: str, response: str, embedding: Optional[tuple]):
+        if embedding is None or not response:
+            return
+        model, vector = embedding
+        key = f"{self.prefix}{role}:{hashlib.sha256(f'{model}:{prompt}'.encode()).hexdigest()}"
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping={
+                    "role": role,
+                    "model": model,
+                    "prompt": prompt,
+                    "response": response,
+                    "created": int(time.time()),
+                    "embedding": array("f", vector).tobytes(),
+                })
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+            self.stores += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Semantic cache store failed: {e}")
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
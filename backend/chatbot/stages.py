@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Awaitable, Dict, TypeVar
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+T = TypeVar("T")
+
+# Per-stage deadlines (seconds) for the chat request pipeline
+HISTORY_STAGE_TIMEOUT = float(os.getenv("HISTORY_STAGE_TIMEOUT", 1.0))
+RETRIEVAL_STAGE_TIMEOUT = float(os.getenv("RETRIEVAL_STAGE_TIMEOUT", 2.5))
+SUMMARY_STAGE_TIMEOUT = float(os.getenv("SUMMARY_STAGE_TIMEOUT", 0.5))
+SEMANTIC_CACHE_STAGE_TIMEOUT = float(os.getenv("SEMANTIC_CACHE_STAGE_TIMEOUT", 0.3))
+
+
+class StageStats:
+    """Cumulative per-stage latency, timeout and failure counts for /metrics."""
+
+    def __init__(self):
+        self.count: Dict[str, int] = defaultdict(int)
+        self.total_ms: Dict[str, float] = defaultdict(float)
+        self.max_ms: Dict[str, float] = defaultdict(float)
+        self.timeouts: Dict[str, int] = defaultdict(int)
+        self.failures: Dict[str, int] = defaultdict(int)
+
+    def record(self, name: str, elapsed_ms: float):
+        self.count[name] += 1
+        self.total_ms[name] += elapsed_ms
+        self.max_ms[name] = max(self.max_ms[name], elapsed_ms)
+
+    def metrics(self) -> dict:
+        return {
+            name: {
+                "count": count,
+                "avg_ms": round(self.total_ms[name] / count, 2),
+                "max_ms": round(self.max_ms[name], 2),
+                "timeouts": self.timeouts[name],
+                "failures": self.failures[name],
+            }
+            for name, count in self.count.items()
+        }
+
+
+stage_stats = StageStats()
+
+
+class StageTimings:
+    """Timings of one request's stages, rendered as a Server-Timing header."""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    async def run(self, name: str, awaitable: Awaitable[T], timeout: float, fallback: T) -> T:
+        """Await a stage under its deadline; on timeout or error log it and return `fallback` instead of failing."""
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            stage_stats.timeouts[name] += 1
+            logger.warning(f"Stage '{name}' exceeded {timeout}s, continuing without it")
+            return fallback
+        except Exception as e:
+            stage_stats.failures[name] += 1
+            logger.warning(f"Stage '{name}' failed, continuing without it: {e}")
+            return fallback
+        finally:
+            self.record(name, start)
+
+    def record(self, name: str, start: float):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.timings[name] = elapsed_ms
+        stage_stats.record(name, elapsed_ms)
+
+    def header(self) -> str:
+        return ", ".join(f"{name};dur={elapsed:.1f}" for name, elapsed in self.timings.items())
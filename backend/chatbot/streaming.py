@@ -0,0 +1,150 @@
+import asyncio
+import json
+import os
+import time
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Coalesce streamed tokens into one SSE frame per STREAM_FLUSH_INTERVAL seconds or STREAM_FLUSH_CHARS characters
+STREAM_FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_INTERVAL", 0.05))
+STREAM_FLUSH_CHARS = int(os.getenv("STREAM_FLUSH_CHARS", 256))
+# SSE comment sent while the response is still being prepared, so proxies and clients keep the connection
+STREAM_HEARTBEAT_INTERVAL = float(os.getenv("STREAM_HEARTBEAT_INTERVAL", 2.0))
+# How often an active stream checks whether the client is still connected
+STREAM_DISCONNECT_POLL_INTERVAL = float(os.getenv("STREAM_DISCONNECT_POLL_INTERVAL", 0.5))
+
+HEARTBEAT = ": heartbeat\n\n"
+DONE = "data: [DONE]\n\n"
+# Headers that stop intermediaries from buffering the event stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+class ClientDisconnected(Exception):
+    """The client closed the event stream before the answer was complete."""
+
+
+class StreamStats:
+    """Counters for streamed chats, exported on /metrics."""
+
+    def __init__(self):
+        self.completed = 0
+        self.cancelled = 0
+        # Characters generated for streams that were then abandoned
+        self.cancelled_chars = 0
+
+    def metrics(self) -> dict:
+        finished = self.completed + self.cancelled
+        return {
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "cancelled_chars": self.cancelled_chars,
+            "cancel_rate": self.cancelled / finished if finished else 0.0,
+        }
+
+
+stream_stats = StreamStats()
+
+
+def sse_data(payload: dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+async def heartbeats_until(task: asyncio.Future, interval: float = STREAM_HEARTBEAT_INTERVAL) -> AsyncGenerator[str, None]:
+    """Yield a heartbeat comment every `interval` seconds until `task` is done."""
+    while not task.done():
+        done, _ = await asyncio.wait({task}, timeout=interval)
+        if not done:
+            yield HEARTBEAT
+
+
+async def coalesce(chunks: AsyncIterator[str], interval: float = STREAM_FLUSH_INTERVAL,
+                   max_chars: int = STREAM_FLUSH_CHARS) -> AsyncGenerator[str, None]:
+    """Merge small chunks into larger ones.
+
+    The first chunk is passed through at once to keep time-to-first-token low; after
+    that a batch is released when it reaches `max_chars` or `interval` seconds after
+    the previous release, even if the upstream is stalled. Whatever is left is
+    released at the end.
+    """
+    buffer = []
+    size = 0
+    flushed_at = None
+    step = None
+    try:
+        while True:
+            if step is None:
+                step = asyncio.ensure_future(chunks.__anext__())
+            timeout = None
+            if buffer:
+                timeout = max(0.0, interval - (time.monotonic() - flushed_at))
+            done, _ = await asyncio.wait({step}, timeout=timeout)
+            if not done:
+                # Upstream is slow; release what is buffered and keep waiting on the same step
+                yield "".join(buffer)
+                buffer, size, flushed_at = [], 0, time.monotonic()
+                continue
+            try:
+                chunk = step.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                step = None
+            if not chunk:
+                continue
+            buffer.append(chunk)
+            size += len(chunk)
+            now = time.monotonic()
+            if flushed_at is None or size >= max_chars or now - flushed_at >= interval:
+                yield "".join(buffer)
+                buffer, size, flushed_at = [], 0, now
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        # Unwind a pending step so `chunks` can be closed by its owner
+        if step is not None and not step.done():
+            step.cancel()
+            await asyncio.wait({step})
+        if step is not None and step.done() and not step.cancelled():
+            step.exception()  # mark retrieved
+
+
+async def _wait_disconnect(is_disconnected: Callable[[], Awaitable[bool]], interval: float):
+    while not await is_disconnected():
+        await asyncio.sleep(interval)
+
+
+async def until_disconnected(frames: AsyncIterator[str], is_disconnected: Callable[[], Awaitable[bool]],
+                             interval: float = STREAM_DISCONNECT_POLL_INTERVAL) -> AsyncGenerator[str, None]:
+    """Relay `frames` while the client stays connected.
+
+    Each step of `frames` is raced against a disconnect watcher; when the client goes
+    away the pending step is cancelled, which unwinds the upstream stream at once even
+    if it is stalled, and ClientDisconnected is raised.
+    """
+    watcher = asyncio.ensure_future(_wait_disconnect(is_disconnected, interval))
+    step = None
+    try:
+        while True:
+            step = asyncio.ensure_future(frames.__anext__())
+            await asyncio.wait({step, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not step.done():
+                step.cancel()
+                await asyncio.wait({step})
+                raise ClientDisconnected()
+            try:
+                frame = step.result()
+            except StopAsyncIteration:
+                return
+            yield frame
+    finally:
+        # When the consumer itself is cancelled (Starlette tearing down the response) the
+        # pending step must be unwound here, or closing `frames` fails because it is still running
+        if step is not None and not step.done():
+            step.cancel()
+            await asyncio.wait({step})
+        if step is not None and step.done() and not step.cancelled():
+            step.exception()  # mark retrieved
+        watcher.cancel()
@@ -0,0 +1,344 @@
+import asyncio
+
+import pytest
+
+import chat_router
+from models import ChatRequest
+from stages import StageTimings
+
+
+def test_chat_router_imports():
+    assert chat_router.router is not None
+    assert callable(chat_router._call_vector_service)
+    assert callable(chat_router._build_context)
+
+
+def test_prepare_turn_builds_context_from_retrieval(monkeypatch):
+    async def recent_window(session_id, limit):
+        return 0, []
+
+    async def append(session_id, *messages):
+        return None
+
+    async def similarity_search(payload):
+        assert payload["user_id"] == "42"
+        return [{"message": "What is the weather?", "response": "It is sunny.", "score": 0.9}]
+
+    monkeypatch.setattr(chat_router.history_store, "recent_window", recent_window)
+    monkeypatch.setattr(chat_router.history_store, "append", append)
+    monkeypatch.setattr(chat_router, "_similarity_search", similarity_search)
+    monkeypatch.setattr(chat_router, "semantic_cache", None)
+
+    request = ChatRequest(message="How is the weather?")
+    context, prompt_history, cached_response, _ = asyncio.run(
+        chat_router._prepare_turn(request, "42", StageTimings())
+    )
+    assert "It is sunny." in context
+    assert prompt_history == []
+    assert cached_response is None
+
+
+def test_semantic_cache_skipped_when_retrieval_fails(monkeypatch):
+    from circuit_breaker import CircuitBreaker
+
+    lookups = []
+
+    class FakeCache:
+        async def lookup(self, role, prompt):
+            lookups.append(prompt)
+            return None, None
+
+    async def recent_window(session_id, limit):
+        return 0, []
+
+    async def append(session_id, *messages):
+        return None
+
+    async def failing_search(payload):
+        raise RuntimeError("vector service down")
+
+    async def empty_search(payload):
+        return []
+
+    monkeypatch.setattr(chat_router.history_store, "recent_window", recent_window)
+    monkeypatch.setattr(chat_router.history_store, "append", append)
+    monkeypatch.setattr(chat_router, "semantic_cache", FakeCache())
+    monkeypatch.setattr(chat_router, "vector_breaker", CircuitBreaker("test", min_calls=1))
+
+    def prepare():
+        return asyncio.run(chat_router._prepare_turn(ChatRequest(message="Hello"), "42", StageTimings()))
+
+    # A failed retrieval is not "no personal context", and it opens the breaker
+    monkeypatch.setattr(chat_router, "_similarity_search", failing_search)
+    prepare()
+    assert lookups == []
+    # While the breaker is open retrieval is skipped, and so is the cache
+    monkeypatch.setattr(chat_router, "_similarity_search", empty_search)
+    prepare()
+    assert lookups == []
+
+    monkeypatch.setattr(chat_router, "vector_breaker", CircuitBreaker("test"))
+    prepare()
+    assert lookups == ["Hello"]
+
+
+def test_cancelled_stream_closes_upstream():
+    from contextlib import aclosing
+    from streaming import coalesce, until_disconnected
+
+    closed = []
+    received = []
+
+    async def llm():
+        try:
+            for i in range(100):
+                await asyncio.sleep(0.01)
+                yield f"t{i} "
+        finally:
+            closed.append(True)
+
+    async def connected():
+        return False
+
+    async def consume():
+        chunks = llm()
+        async with aclosing(chunks), aclosing(coalesce(chunks, interval=0)) as frames:
+            async for frame in until_disconnected(frames, connected, interval=0.01):
+                received.append(frame)
+
+    async def main():
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    assert asyncio.run(main())
+    assert received
+    assert closed == [True]
+
+
+def test_coalesce_flushes_during_stall():
+    from streaming import coalesce
+
+    async def llm():
+        yield "a"
+        yield "b"
+        await asyncio.sleep(0.5)
+        yield "c"
+
+    async def main():
+        start = asyncio.get_running_loop().time()
+        frames = []
+        async for frame in coalesce(llm(), interval=0.05):
+            frames.append((frame, asyncio.get_running_loop().time() - start))
+        return frames
+
+    frames = asyncio.run(main())
+    assert [frame for frame, _ in frames] == ["a", "b", "c"]
+    # "b" is released on the flush interval, not held until the stalled upstream resumes
+    assert frames[1][1] < 0.3
+
+
+def test_summarizer_folds_each_position_once():
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from langchain_core.messages import AIMessage, HumanMessage
+    from prompt_budget import HistorySummarizer
+
+    class FakeRedis:
+        def __init__(self):
+            self.data = {}
+
+        async def get(self, key):
+            return self.data.get(key)
+
+        async def set(self, key, value, ex=None):
+            self.data[key] = value
+
+    llm = FakeListChatModel(responses=["summary 1", "summary 2"])
+    summarizer = HistorySummarizer(FakeRedis(), llm=llm)
+    # The same content recurs later in the conversation and must still be folded in
+    turn = [HumanMessage(content="hi"), AIMessage(content="hello")]
+
+    async def main():
+        await summarizer.update("s", turn, 0)
+        await summarizer.update("s", turn, 0)  # already summarized, no LLM call
+        await summarizer.update("s", [*turn, *turn], 0)  # only positions 2 and 3 are new
+        return await summarizer._load("s")
+
+    state = asyncio.run(main())
+    assert state == {"summary": "summary 2", "through": 4}
+
+
+def test_summarizer_folds_turns_that_left_the_window():
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from langchain_core.messages import AIMessage, HumanMessage
+    from prompt_budget import HistorySummarizer
+
+    class FakeRedis:
+        def __init__(self):
+            self.data = {}
+
+        async def get(self, key):
+            return self.data.get(key)
+
+        async def set(self, key, value, ex=None):
+            self.data[key] = value
+
+    history = [HumanMessage(content=f"q{i}") if i % 2 == 0 else AIMessage(content=f"a{i}") for i in range(10)]
+
+    class FakeHistoryStore:
+        async def range(self, session_id, start, end):
+            return history[start:end]
+
+    class RecordingModel(FakeListChatModel):
+        transcripts: list = []
+
+        def _call(self, messages, *args, **kwargs):
+            self.transcripts.append(messages[-1].content)
+            return super()._call(messages, *args, **kwargs)
+
+    llm = RecordingModel(responses=["summary"])
+    summarizer = HistorySummarizer(FakeRedis(), FakeHistoryStore(), llm=llm)
+
+    async def main():
+        # Window starts at position 6 with nothing evicted: positions 0-5 slid out of it
+        await summarizer.update("s", [], 6)
+        # Later the window starts at 8 and evicts it; 6 and 7 left the window in between
+        await summarizer.update("s", history[8:9], 8)
+        return await summarizer._load("s")
+
+    state = asyncio.run(main())
+    assert state["through"] == 9
+    assert "q0" in llm.transcripts[0] and "a5" in llm.transcripts[0] and "q6" not in llm.transcripts[0]
+    assert "q6" in llm.transcripts[1] and "a7" in llm.transcripts[1] and "q8" in llm.transcripts[1]
+
+
+def _access_token(key: str = "secret", **claims) -> str:
+    import time
+    import jwt
+
+    payload = {"user_id": 42, "token_type": "access", "jti": "abc", "exp": int(time.time()) + 300}
+    payload.update(claims)
+    return jwt.encode({k: v for k, v in payload.items() if v is not None}, key, algorithm="HS256")
+
+
+def test_local_token_verifier_accepts_valid_access_token():
+    from auth import LocalTokenVerifier
+
+    info = asyncio.run(LocalTokenVerifier("secret").verify(_access_token(email="a@example.com")))
+    assert info == {"authenticated": True, "user": {"id": 42, "email": "a@example.com"}}
+
+
+def test_local_token_verifier_rejects_invalid_tokens():
+    import time
+    from auth import InvalidToken, LocalTokenVerifier
+
+    verifier = LocalTokenVerifier("secret")
+    for token in (
+        _access_token(key="other-secret"),  # bad signature
+        _access_token(exp=int(time.time()) - 10),  # expired
+        _access_token(token_type="refresh"),
+        _access_token(user_id=None),
+    ):
+        with pytest.raises(InvalidToken):
+            asyncio.run(verifier.verify(token))
+
+
+def test_local_token_verifier_rejects_blacklisted_token():
+    from auth import BLACKLIST_KEY_PREFIX, InvalidToken, LocalTokenVerifier
+
+    class FakeRedis:
+        async def exists(self, key):
+            return int(key == f"{BLACKLIST_KEY_PREFIX}revoked")
+
+    verifier = LocalTokenVerifier("secret", redis_client=FakeRedis())
+    assert asyncio.run(verifier.verify(_access_token(jti="live")))["authenticated"]
+    with pytest.raises(InvalidToken):
+        asyncio.run(verifier.verify(_access_token(jti="revoked")))
+
+
+def test_local_token_verifier_cache_never_outlives_token(monkeypatch):
+    import time
+    import auth
+
+    exp = int(time.time()) + 5
+    token = _access_token(exp=exp)
+    verifier = auth.LocalTokenVerifier("secret", cache_ttl=600)
+    asyncio.run(verifier.verify(token))
+    key = verifier._token_key(token)
+    assert verifier._cache_get(key) is not None
+
+    monkeypatch.setattr(auth.time, "time", lambda: exp + 1)
+    assert verifier._cache_get(key) is None
+
+
+class _FakeBucketRedis:
+    """Stands in for the token bucket script: returns queued (allowed, retry_after) results."""
+
+    def __init__(self, results=None, error=None):
+        self.results = list(results or [])
+        self.error = error
+
+    def register_script(self, script):
+        async def run(keys, args):
+            if self.error is not None:
+                raise self.error
+            return self.results.pop(0) if self.results else (1, "0")
+        return run
+
+
+def test_admission_admits_and_releases_slots():
+    from admission import AdmissionController
+
+    controller = AdmissionController(_FakeBucketRedis(), max_inflight=2)
+    slot = asyncio.run(controller.admit("42"))
+    assert controller.metrics()["in_flight"] == 1
+    slot.release()
+    slot.release()  # idempotent
+    assert controller.metrics()["in_flight"] == 0
+    assert controller.metrics()["admitted"] == 1
+
+
+def test_admission_rate_limits():
+    from admission import AdmissionController, AdmissionRejected
+
+    controller = AdmissionController(_FakeBucketRedis([(0, "5.0")]), max_wait=1.0)
+    with pytest.raises(AdmissionRejected) as rejected:
+        asyncio.run(controller.admit("42"))
+    assert rejected.value.reason == "rate_limited"
+    assert AdmissionController.retry_after_header(rejected.value) == "5"
+
+    # A token that becomes available within max_wait is waited for
+    controller = AdmissionController(_FakeBucketRedis([(0, "0.01"), (1, "0")]), max_wait=1.0)
+    asyncio.run(controller.admit("42"))
+    assert controller.metrics()["admitted"] == 1
+
+
+def test_admission_rejects_when_all_slots_are_busy():
+    from admission import AdmissionController, AdmissionRejected
+
+    async def main():
+        controller = AdmissionController(_FakeBucketRedis(), max_inflight=1, max_wait=0.05)
+        slot = await controller.admit("1")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.admit("2")
+        assert rejected.value.reason == "overloaded"
+        slot.release()
+        await controller.admit("2")
+        return controller.metrics()
+
+    metrics = asyncio.run(main())
+    assert metrics["rejected_overloaded"] == 1
+    assert metrics["admitted"] == 2
+
+
+def test_admission_fails_open_without_redis():
+    from admission import AdmissionController
+
+    controller = AdmissionController(_FakeBucketRedis(error=ConnectionError("redis down")))
+    asyncio.run(controller.admit("42"))
+    assert controller.metrics()["admitted"] == 1
@@ -4,8 +4,11 @@ CREATE TABLE IF NOT EXISTS chat_history (
     message TEXT NOT NULL,
     response TEXT NOT NULL,
     timestamp TIMESTAMPTZ NOT NULL,
+    interrupted BOOLEAN NOT NULL DEFAULT FALSE,
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+ALTER TABLE chat_history ADD COLUMN IF NOT EXISTS interrupted BOOLEAN NOT NULL DEFAULT FALSE;
+
 CREATE INDEX IF NOT EXISTS idx_chat_history_user_id ON chat_history(user_id);
 CREATE INDEX IF NOT EXISTS idx_chat_history_timestamp ON chat_history(timestamp);
\ No newline at end of file
@@ -0,0 +1,116 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import asyncpg
+import pytest
+
+import user_history
+
+
+class FakeMessage:
+    def __init__(self, user_id: str):
+        self.body = json.dumps({
+            "user_id": user_id,
+            "message": "What is the weather?",
+            "response": "It is sunny.",
+            "timestamp": "2025-07-09T12:00:00",
+        }).encode()
+        self.processed = False
+        self.outcome = None
+
+    async def ack(self):
+        self.processed, self.outcome = True, "ack"
+
+    async def reject(self, requeue: bool = False):
+        self.processed, self.outcome = True, ("requeue" if requeue else "reject")
+
+    async def nack(self, requeue: bool = True):
+        self.processed, self.outcome = True, ("requeue" if requeue else "reject")
+
+
+class FakeConnection:
+    """COPY fails with `copy_error`; row inserts fail with `row_errors[user_id]`."""
+
+    def __init__(self, copy_error: Exception, row_errors: dict):
+        self.copy_error = copy_error
+        self.row_errors = row_errors
+        self.inserted = []
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def copy_records_to_table(self, table, records, columns):
+        raise self.copy_error
+
+    async def execute(self, sql, user_id, *args):
+        if user_id in self.row_errors:
+            raise self.row_errors[user_id]
+        self.inserted.append(user_id)
+
+
+class FakePool:
+    def __init__(self, conn: FakeConnection):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    queued = []
+
+    async def queue_embeddings(histories):
+        queued.extend(history.user_id for history in histories)
+
+    monkeypatch.setattr(user_history, "_queue_embeddings", queue_embeddings)
+    return queued
+
+
+def _run_batch(monkeypatch, conn: FakeConnection, user_ids: list) -> list:
+    monkeypatch.setattr(user_history, "connection_pool", FakePool(conn))
+    messages = [FakeMessage(user_id) for user_id in user_ids]
+    asyncio.run(user_history.handle_history_batch(messages))
+    return messages
+
+
+def test_poisoned_row_is_rejected_and_the_rest_saved(monkeypatch, queued):
+    conn = FakeConnection(asyncpg.DataError("bad row"), {"b": asyncpg.DataError("bad row")})
+    messages = _run_batch(monkeypatch, conn, ["a", "b", "c"])
+    assert [message.outcome for message in messages] == ["ack", "reject", "ack"]
+    assert conn.inserted == ["a", "c"]
+    assert queued == ["a", "c"]
+
+
+def test_transient_error_during_fallback_requeues_the_batch(monkeypatch, queued):
+    conn = FakeConnection(asyncpg.DataError("bad row"), {"b": asyncpg.AdminShutdownError("failover")})
+    messages = _run_batch(monkeypatch, conn, ["a", "b", "c"])
+    assert [message.outcome for message in messages] == ["requeue"] * 3
+    assert queued == []
+
+
+def test_transient_copy_error_requeues_without_row_fallback(monkeypatch, queued):
+    conn = FakeConnection(asyncpg.DeadlockDetectedError("deadlock"), {})
+    messages = _run_batch(monkeypatch, conn, ["a", "b"])
+    assert [message.outcome for message in messages] == ["requeue"] * 2
+    assert conn.inserted == []
+
+
+def test_interrupted_turns_are_stored_but_not_embedded(monkeypatch):
+    published = []
+
+    async def publish(histories, retry_count=0):
+        published.extend(history.response for history in histories)
+
+    monkeypatch.setattr(user_history, "publish_embedding_upserts", publish)
+    complete = user_history.parse_history(FakeMessage("a").body)
+    body = json.loads(FakeMessage("b").body)
+    partial = user_history.parse_history(json.dumps({**body, "response": "It is", "interrupted": True}).encode())
+    assert not complete.interrupted and partial.interrupted
+    assert user_history._history_record(partial)[-1] is True
+
+    asyncio.run(user_history._queue_embeddings([complete, partial]))
+    assert published == ["It is sunny."]
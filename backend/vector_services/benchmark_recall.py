@@ -0,0 +1,103 @@
+"""
+Recall and memory comparison of FLOAT16 / INT8 vector storage against the FLOAT32 baseline.
+
+Exact (brute-force) cosine top-k over float32 vectors is the ground truth; each
+storage dtype is scored by how much of that top-k it reproduces after conversion.
+
+There are two INT8 rows. "INT8 (backfill)" quantizes the float32 vectors locally,
+which is only what documents embedded before INT8 was enabled get. "INT8 (cohere)"
+uses the int8 embeddings Cohere returned, as stored for new documents and used for
+queries; it is shown only when every loaded document has one.
+
+    python benchmark_recall.py                      # vectors from doc:* hashes in REDIS_URL
+    python benchmark_recall.py --synthetic 20000    # clustered random vectors, no network
+"""
+import argparse
+import asyncio
+import os
+
+import numpy as np
+import redis.asyncio as aioredis
+from dotenv import load_dotenv
+
+from index_manager import NUMPY_DTYPES, VECTOR_FIELDS, to_storage
+
+load_dotenv()
+
+
+async def load_vectors(limit: int) -> tuple:
+    """Float32 vectors from doc:* hashes, plus their Cohere int8 vectors if all of them have one."""
+    redis_client = aioredis.from_url(os.getenv("REDIS_URL"))
+    vectors = []
+    int8_vectors = []
+    try:
+        async for key in redis_client.scan_iter(match="doc:*", count=500):
+            value, int8_value = await redis_client.hmget(key, VECTOR_FIELDS["FLOAT32"], VECTOR_FIELDS["INT8"])
+            if value is not None:
+                vectors.append(np.frombuffer(value, dtype=np.float32))
+                int8_vectors.append(None if int8_value is None else np.frombuffer(int8_value, dtype=np.int8))
+            if len(vectors) >= limit:
+                break
+    finally:
+        await redis_client.aclose()
+    if not vectors:
+        raise SystemExit("No float32 embeddings found under doc:*")
+    if any(vector is None for vector in int8_vectors):
+        return np.stack(vectors), None
+    return np.stack(vectors), np.stack(int8_vectors)
+
+
+def synthetic_vectors(count: int, dim: int, clusters: int = 50, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, size=count)
+    return (centers[labels] + 0.5 * rng.normal(size=(count, dim))).astype(np.float32)
+
+
+def top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall(expected: np.ndarray, found: np.ndarray) -> float:
+    hits = sum(len(set(e) & set(f)) for e, f in zip(expected, found))
+    return hits / expected.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, help="use N synthetic vectors instead of Redis")
+    parser.add_argument("--dim", type=int, default=int(os.getenv("DEFAULT_EMBED_DIM", 1024)))
+    parser.add_argument("--limit", type=int, default=20000, help="max documents to load from Redis")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors, int8_vectors = synthetic_vectors(args.synthetic, args.dim), None
+    else:
+        vectors, int8_vectors = asyncio.run(load_vectors(args.limit))
+    queries, corpus = vectors[:args.queries], vectors[args.queries:]
+    baseline = top_k(corpus, queries, args.k)
+
+    rows = []
+    for dtype, numpy_dtype in NUMPY_DTYPES.items():
+        stored = np.stack([to_storage(v, numpy_dtype) for v in corpus])
+        query = np.stack([to_storage(v, numpy_dtype) for v in queries])
+        rows.append(("INT8 (backfill)" if dtype == "INT8" else dtype, stored, query))
+    if int8_vectors is not None:
+        rows.append(("INT8 (cohere)", int8_vectors[args.queries:], int8_vectors[:args.queries]))
+
+    print(f"{len(corpus)} documents, {len(queries)} queries, dim={vectors.shape[1]}, k={args.k}")
+    if int8_vectors is None and not args.synthetic:
+        print("Cohere int8 embeddings missing on some documents; INT8 (cohere) row skipped")
+    print(f"{'dtype':<16} {'bytes/doc':>10} {'recall@k':>10}")
+    for label, stored, query in rows:
+        found = top_k(stored.astype(np.float32), query.astype(np.float32), args.k)
+        bytes_per_doc = stored.shape[1] * stored.dtype.itemsize
+        print(f"{label:<16} {bytes_per_doc:>10} {recall(baseline, found):>10.4f}")
+
+if __name__ == "__main__":
+    main()
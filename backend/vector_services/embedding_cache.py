@@ -0,0 +1,102 @@
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+
+# numpy dtype of each Cohere embedding type
+KIND_DTYPES = {"float": np.float32, "int8": np.int8}
+
+
+class EmbeddingCache:
+    """
+    Two-level cache of embeddings keyed by hash of (model, input_type, kind, text).
+
+    An in-process LRU bounded to `max_items` sits in front of a Redis store whose
+    entries expire after `ttl` seconds. Vectors are stored as raw bytes of the
+    embedding kind's dtype (float32 or int8).
+    """
+
+    def __init__(self, redis_client: Redis, max_items: int = 10000, ttl: int = 7 * 86400,
+                 prefix: str = "emb:"):
+        self.redis = redis_client
+        self.max_items = max_items
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lru: "OrderedDict[str, bytes]" = OrderedDict()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def key(self, model: str, input_type: str, text: str, kind: str = "float") -> str:
+        namespace = input_type if kind == "float" else f"{input_type}:{kind}"
+        digest = hashlib.sha256(f"{model}\x00{namespace}\x00{text}".encode()).hexdigest()
+        return f"{self.prefix}{digest}"
+
+    def _remember(self, key: str, value: bytes):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_items:
+            self._lru.popitem(last=False)
+
+    async def get_many(self, model: str, input_type: str, texts: List[str],
+                       kind: str = "float") -> List[Optional[np.ndarray]]:
+        """Return cached vectors aligned with `texts`, None where nothing is cached."""
+        keys = [self.key(model, input_type, text, kind) for text in texts]
+        found: List[Optional[bytes]] = [None] * len(keys)
+        remote = []
+        for i, key in enumerate(keys):
+            value = self._lru.get(key)
+            if value is not None:
+                self._lru.move_to_end(key)
+                found[i] = value
+                self.local_hits += 1
+            else:
+                remote.append(i)
+
+        if remote:
+            try:
+                values = await self.redis.mget([keys[i] for i in remote])
+            except Exception as e:
+                logger.warning(f"Embedding cache lookup failed: {e}")
+                values = [None] * len(remote)
+            for i, value in zip(remote, values):
+                if value is None:
+                    self.misses += 1
+                    continue
+                self.redis_hits += 1
+                found[i] = value
+                self._remember(keys[i], value)
+
+        dtype = KIND_DTYPES[kind]
+        return [np.frombuffer(value, dtype=dtype) if value is not None else None for value in found]
+
+    async def set_many(self, model: str, input_type: str, texts: List[str], vectors: List[np.ndarray],
+                       kind: str = "float"):
+        if not texts:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for text, vector in zip(texts, vectors):
+                    key = self.key(model, input_type, text, kind)
+                    value = np.asarray(vector, dtype=KIND_DTYPES[kind]).tobytes()
+                    self._remember(key, value)
+                    pipe.set(key, value, ex=self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Embedding cache store failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": (self.local_hits + self.redis_hits) / lookups if lookups else 0.0,
+            "local_size": len(self._lru),
+        }
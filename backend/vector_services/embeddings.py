@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+
+from embedding_cache import EmbeddingCache, KIND_DTYPES
+from index_manager import to_storage
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+# "cohere" (hosted API) or "local" (sentence-transformers on CPU, no network)
+EMBED_PROVIDER = os.getenv("EMBED_PROVIDER", "cohere").lower()
+COHERE_API_KEY = os.getenv("COHERE_API_KEY")
+EMBED_MODEL = os.getenv("EMBED_MODEL", "embed-english-v3.0")
+LOCAL_EMBED_MODEL = os.getenv("LOCAL_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# "torch" or "onnx" (needs sentence-transformers[onnx])
+LOCAL_EMBED_BACKEND = os.getenv("LOCAL_EMBED_BACKEND", "torch")
+LOCAL_EMBED_WORKERS = int(os.getenv("LOCAL_EMBED_WORKERS", 2))
+LOCAL_EMBED_BATCH_SIZE = int(os.getenv("LOCAL_EMBED_BATCH_SIZE", 64))
+# Instruction prefixes for asymmetric local models (e.g. "query: " / "passage: " for e5)
+LOCAL_QUERY_PREFIX = os.getenv("LOCAL_QUERY_PREFIX", "")
+LOCAL_DOCUMENT_PREFIX = os.getenv("LOCAL_DOCUMENT_PREFIX", "")
+# embed-english-v3.0 produces 1024-dimensional vectors, all-MiniLM-L6-v2 384
+DEFAULT_EMBED_DIM = int(os.getenv("DEFAULT_EMBED_DIM", 384 if EMBED_PROVIDER == "local" else 1024))
+# Cohere accepts at most 96 texts per embed call
+EMBED_BATCH_SIZE = min(int(os.getenv("EMBED_BATCH_SIZE", 96)), 96)
+
+# Cohere v3 models are trained asymmetrically: stored texts and queries use different input types
+DOCUMENT_INPUT_TYPE = "search_document"
+QUERY_INPUT_TYPE = "search_query"
+
+
+class EmbeddingDimensionError(RuntimeError):
+    """Raised when the model's output dimension does not match DEFAULT_EMBED_DIM."""
+
+
+class EmbeddingProvider(ABC):
+    """
+    Backend that turns texts into vectors.
+
+    `embed` returns one list of vectors per requested kind ("float", "int8"), aligned
+    with `texts`. `model` names the vectors in the embedding cache, so providers never
+    share cache entries. `outage_errors` are the exceptions that mean the backend is
+    unreachable rather than misbehaving.
+    """
+
+    model: str
+    batch_size: int
+    outage_errors: tuple = ()
+
+    @abstractmethod
+    async def embed(self, texts: List[str], input_type: str, kinds: Sequence[str]) -> Dict[str, List[np.ndarray]]:
+        ...
+
+    def close(self):
+        pass
+
+
+class CohereProvider(EmbeddingProvider):
+    def __init__(self, model: str = EMBED_MODEL, batch_size: int = EMBED_BATCH_SIZE,
+                 api_key: Optional[str] = COHERE_API_KEY):
+        import cohere
+        import httpx
+        from cohere.core.api_error import ApiError
+
+        self.model = model
+        self.batch_size = batch_size
+        self.client = cohere.AsyncClientV2(api_key)
+        self.outage_errors = (ApiError, httpx.HTTPError)
+
+    async def embed(self, texts: List[str], input_type: str, kinds: Sequence[str]) -> Dict[str, List[np.ndarray]]:
+        embed_response = await self.client.embed(
+            texts=texts,
+            model=self.model,
+            input_type=input_type,
+            embedding_types=list(kinds)
+        )
+        return self._parse(embed_response.embeddings, kinds)
+
+    @staticmethod
+    def _parse(embeddings, kinds: Sequence[str]) -> Dict[str, List[np.ndarray]]:
+        # Read by the wire names: newer SDKs expose the float vectors as `float_`
+        by_kind = embeddings.model_dump(by_alias=True)
+        return {kind: [np.array(vector, dtype=KIND_DTYPES[kind]) for vector in by_kind[kind]] for kind in kinds}
+
+
+# Loaded once per worker process by _init_local_worker
+_local_model = None
+
+
+def _init_local_worker(model_name: str, backend: str):
+    global _local_model
+    from sentence_transformers import SentenceTransformer
+
+    _local_model = SentenceTransformer(model_name, device="cpu", backend=backend)
+
+
+def _local_encode(texts: List[str], batch_size: int) -> np.ndarray:
+    return _local_model.encode(texts, batch_size=batch_size, normalize_embeddings=True,
+                               convert_to_numpy=True).astype(np.float32)
+
+
+class LocalProvider(EmbeddingProvider):
+    """
+    sentence-transformers model run on CPU in a pool of worker processes.
+
+    Each worker loads the model once; batches are encoded off the event loop and
+    without contending for the GIL. int8 vectors are quantized from the float ones.
+    """
+
+    def __init__(self, model: str = LOCAL_EMBED_MODEL, backend: str = LOCAL_EMBED_BACKEND,
+                 workers: int = LOCAL_EMBED_WORKERS, batch_size: int = LOCAL_EMBED_BATCH_SIZE,
+                 query_prefix: str = LOCAL_QUERY_PREFIX, document_prefix: str = LOCAL_DOCUMENT_PREFIX):
+        self.model = model
+        self.batch_size = batch_size
+        self.prefixes = {QUERY_INPUT_TYPE: query_prefix, DOCUMENT_INPUT_TYPE: document_prefix}
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_local_worker, initargs=(model, backend)
+        )
+
+    async def embed(self, texts: List[str], input_type: str, kinds: Sequence[str]) -> Dict[str, List[np.ndarray]]:
+        prefix = self.prefixes.get(input_type, "")
+        loop = asyncio.get_running_loop()
+        floats = await loop.run_in_executor(
+            self.executor, _local_encode, [f"{prefix}{text}" for text in texts], self.batch_size
+        )
+        return {kind: [to_storage(vector, KIND_DTYPES[kind]) for vector in floats] for kind in kinds}
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_provider(name: str = EMBED_PROVIDER) -> EmbeddingProvider:
+    if name == "cohere":
+        return CohereProvider()
+    if name == "local":
+        return LocalProvider()
+    raise ValueError(f"Unknown EMBED_PROVIDER '{name}', expected 'cohere' or 'local'")
+
+
+class EmbeddingClient:
+    """
+    The single entry point for embedding in the vector service.
+
+    Documents are embedded as `search_document` and queries as `search_query`
+    through the configured provider, and results go through the embedding cache.
+    """
+
+    def __init__(self, cache: EmbeddingCache, provider: Optional[EmbeddingProvider] = None):
+        self.cache = cache
+        self.provider = provider or create_provider()
+
+    @property
+    def model(self) -> str:
+        return self.provider.model
+
+    async def _embed(self, texts: List[str], input_type: str, kinds: Sequence[str]) -> Dict[str, List[np.ndarray]]:
+        """Embed preprocessed texts as each requested kind ("float", "int8"), keyed by kind.
+
+        Repeats are served from the cache; the rest are embedded in batches, with every
+        missing kind requested in the same call.
+        """
+        vectors = {kind: await self.cache.get_many(self.model, input_type, texts, kind) for kind in kinds}
+        missing = [i for i in range(len(texts)) if any(vectors[kind][i] is None for kind in kinds)]
+        batch_size = self.provider.batch_size
+        for start in range(0, len(missing), batch_size):
+            chunk = missing[start:start + batch_size]
+            chunk_texts = [texts[i] for i in chunk]
+            embedded = await self.provider.embed(chunk_texts, input_type, kinds)
+            for kind in kinds:
+                await self.cache.set_many(self.model, input_type, chunk_texts, embedded[kind], kind)
+                for i, vector in zip(chunk, embedded[kind]):
+                    vectors[kind][i] = vector
+        return vectors
+
+    async def embed_documents(self, texts: List[str], kinds: Sequence[str] = ("float",)) -> Dict[str, List[np.ndarray]]:
+        return await self._embed(texts, DOCUMENT_INPUT_TYPE, kinds)
+
+    async def embed_queries(self, texts: List[str], kinds: Sequence[str] = ("float",)) -> Dict[str, List[np.ndarray]]:
+        return await self._embed(texts, QUERY_INPUT_TYPE, kinds)
+
+    async def embed_query(self, text: str, kind: str = "float") -> np.ndarray:
+        return (await self.embed_queries([text], (kind,)))[kind][0]
+
+    async def check_dimension(self, expected: int = DEFAULT_EMBED_DIM):
+        """Fail fast if the model's vectors would not fit the index dimension.
+
+        A provider outage (network or API error) only logs a warning, so the service can
+        still start; any other failure means embedding is broken and is raised.
+        """
+        try:
+            vector = await self.embed_query("dimension check")
+        except (OSError, asyncio.TimeoutError, *self.provider.outage_errors) as e:
+            logger.warning(f"Could not verify embedding dimension: {e}")
+            return
+        if len(vector) != expected:
+            raise EmbeddingDimensionError(
+                f"{self.model} returns {len(vector)}-dimensional embeddings but DEFAULT_EMBED_DIM is {expected}"
+            )
+        logger.info(f"Embedding dimension verified: {expected} ({self.model})")
+
+    def close(self):
+        self.provider.close()
@@ -0,0 +1,410 @@
+"""
+Versioned Redis vector index management for the chat history store.
+
+Each schema revision is created as `<alias>_v<N>` over the same `doc:*` hashes and
+served through the alias (`Chatbot_Index`), so HNSW parameters, metric or dtype can
+be changed online (a new dimension needs the documents re-embedded):
+
+    python index_manager.py status
+    python index_manager.py migrate --m 32 --ef-construction 400 --dtype FLOAT16
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
+
+import numpy as np
+import redis.asyncio as aioredis
+from dotenv import load_dotenv
+from pydantic import BaseModel
+from redis.asyncio import Redis
+from redis.exceptions import LockError
+from redis.commands.search.field import VectorField, TextField, TagField, NumericField
+from redis.commands.search.index_definition import IndexDefinition, IndexType
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+# Hash field holding the vector for each storage dtype
+VECTOR_FIELDS = {"FLOAT32": "embedding", "FLOAT16": "embedding_f16", "INT8": "embedding_i8"}
+NUMPY_DTYPES = {"FLOAT32": np.float32, "FLOAT16": np.float16, "INT8": np.int8}
+# Cohere embedding type requested for each storage dtype
+EMBEDDING_KINDS = {"FLOAT32": "float", "FLOAT16": "float", "INT8": "int8"}
+
+
+def to_storage(vector: np.ndarray, dtype) -> np.ndarray:
+    """Convert a vector to a storage dtype.
+
+    Float -> int8 uses symmetric per-vector scaling, which preserves cosine distance up
+    to rounding; it is only used when backfilling documents embedded before INT8 was on,
+    new documents and queries use Cohere's own int8 embeddings.
+    """
+    vector = np.asarray(vector)
+    if dtype == np.int8 and vector.dtype != np.int8:
+        peak = float(np.max(np.abs(vector))) or 1.0
+        return np.clip(np.rint(vector.astype(np.float32) / peak * 127), -127, 127).astype(np.int8)
+    return vector.astype(dtype)
+
+
+# IndexConfig field -> (env var, parser)
+ENV_OVERRIDES = {
+    "dtype": ("INDEX_DTYPE", str.upper),
+    "metric": ("INDEX_DISTANCE_METRIC", str.upper),
+    "m": ("INDEX_HNSW_M", int),
+    "ef_construction": ("INDEX_EF_CONSTRUCTION", int),
+    "ef_runtime": ("INDEX_EF_RUNTIME", int),
+}
+
+
+class IndexConfig(BaseModel):
+    dim: int
+    dtype: str = "FLOAT32"
+    metric: str = "COSINE"
+    m: int = 16
+    ef_construction: int = 200
+    ef_runtime: int = 10
+
+    @property
+    def vector_field(self) -> str:
+        return VECTOR_FIELDS[self.dtype]
+
+    @property
+    def numpy_dtype(self):
+        return NUMPY_DTYPES[self.dtype]
+
+    @property
+    def embedding_kind(self) -> str:
+        return EMBEDDING_KINDS[self.dtype]
+
+    @classmethod
+    def from_env(cls, dim: int, base: Optional["IndexConfig"] = None) -> "IndexConfig":
+        """Config from INDEX_* env vars; settings whose env var is unset come from `base`.
+
+        Passing the stored active config as `base` keeps a migration done with the CLI
+        from being rolled back on the next restart.
+        """
+        config = base.model_copy(update={"dim": dim}) if base is not None else cls(dim=dim)
+        overrides = {}
+        for field, (name, cast) in ENV_OVERRIDES.items():
+            value = os.getenv(name)
+            if value is not None:
+                overrides[field] = cast(value)
+        return config.model_copy(update=overrides)
+
+
+
+class IndexManager:
+    """
+    Create, backfill and switch versioned indexes behind a stable alias.
+
+    The active and (during a migration) pending and previous configs live in the
+    `<alias>:meta` hash, so every replica knows which vector fields to write and which
+    index to query. Replicas re-read it at most META_REFRESH_SECONDS late, so each
+    migration step that changes what they must do waits out that margin first.
+
+    Migrations run from the CLI; service startup only creates the first index.
+    The migration lock expires LOCK_TTL seconds after its holder dies.
+    """
+
+    META_REFRESH_SECONDS = 30
+    LOCK_TTL = 60
+
+    def __init__(self, redis_client: Redis, alias: str = "Chatbot_Index", prefix: str = "doc:",
+                 scan_batch: int = 500):
+        self.redis = redis_client
+        self.alias = alias
+        self.prefix = prefix
+        self.scan_batch = scan_batch
+        self.meta_key = f"{alias}:meta"
+        self.lock_key = f"{alias}:migration"
+        self.version: Optional[int] = None
+        self.active: Optional[IndexConfig] = None
+        self.pending: Optional[IndexConfig] = None
+        self.previous: Optional[IndexConfig] = None
+        self._refreshed_at = 0.0
+
+    @property
+    def grace_seconds(self) -> float:
+        return self.META_REFRESH_SECONDS + 1
+
+    @property
+    def active_index(self) -> str:
+        """Versioned index for the active config; stale readers keep querying theirs until it is dropped."""
+        return f"{self.alias}_v{self.version}" if self.version is not None else self.alias
+
+    def schema(self, config: IndexConfig) -> list:
+        return [
+            TagField("user_id"),
+            TextField("message"),
+            TextField("response"),
+            TextField("timestamp"),
+            NumericField("ts"),
+            TagField("role"),
+            VectorField(
+                config.vector_field, "HNSW", {
+                    "TYPE": config.dtype,
+                    "DIM": config.dim,
+                    "DISTANCE_METRIC": config.metric,
+                    "M": config.m,
+                    "EF_CONSTRUCTION": config.ef_construction,
+                    "EF_RUNTIME": config.ef_runtime,
+                }
+            )
+        ]
+
+    async def refresh(self):
+        meta = {key.decode(): value.decode() for key, value in (await self.redis.hgetall(self.meta_key)).items()}
+        self.version = int(meta["version"]) if "version" in meta else None
+        self.active = IndexConfig(**json.loads(meta["config"])) if "config" in meta else None
+        self.pending = IndexConfig(**json.loads(meta["pending"])) if "pending" in meta else None
+        self.previous = IndexConfig(**json.loads(meta["previous"])) if "previous" in meta else None
+        self._refreshed_at = time.monotonic()
+
+    async def write_targets(self) -> List[Tuple[str, type, str]]:
+        """(field, dtype, embedding kind) a new document must carry: active plus any pending or previous config."""
+        if time.monotonic() - self._refreshed_at > self.META_REFRESH_SECONDS:
+            await self.refresh()
+        configs = [config for config in (self.active, self.pending, self.previous) if config is not None]
+        targets = {config.vector_field: (config.numpy_dtype, config.embedding_kind) for config in configs}
+        return [(field, dtype, kind) for field, (dtype, kind) in targets.items()] or \
+            [(VECTOR_FIELDS["FLOAT32"], np.float32, "float")]
+
+    async def _index_exists(self, name: str) -> bool:
+        try:
+            await self.redis.ft(name).info()
+            return True
+        except Exception:
+            return False
+
+    async def _wait_indexed(self, name: str, timeout: float = 600):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            info = await self.redis.ft(name).info()
+            if int(info.get("indexing", 0)) == 0:
+                return
+            await asyncio.sleep(0.5)
+        raise TimeoutError(f"Index {name} did not finish indexing in {timeout}s")
+
+    async def backfill(self, config: IndexConfig) -> int:
+        """Fill `config.vector_field` on every doc hash that lacks it, converting from another stored dtype."""
+        target = config.vector_field
+        # VECTOR_FIELDS is ordered most to least precise, so the best available source wins
+        sources = [(field, NUMPY_DTYPES[dtype]) for dtype, field in VECTOR_FIELDS.items() if field != target]
+        source_fields = [field for field, _ in sources]
+        written = 0
+        cursor = 0
+        while True:
+            cursor, keys = await self.redis.scan(cursor, match=f"{self.prefix}*", count=self.scan_batch)
+            if keys:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        pipe.hmget(key, [target, *source_fields])
+                    rows = await pipe.execute()
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key, (existing, *values) in zip(keys, rows):
+                        if existing is not None:
+                            continue
+                        for (_, dtype), value in zip(sources, values):
+                            if value is not None:
+                                vector = to_storage(np.frombuffer(value, dtype=dtype), config.numpy_dtype)
+                                pipe.hset(key, target, vector.tobytes())
+                                written += 1
+                                break
+                    await pipe.execute()
+            if cursor == 0:
+                break
+        return written
+
+    async def _drop_field(self, field: str):
+        cursor = 0
+        while True:
+            cursor, keys = await self.redis.scan(cursor, match=f"{self.prefix}*", count=self.scan_batch)
+            if keys:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        pipe.hdel(key, field)
+                    await pipe.execute()
+            if cursor == 0:
+                break
+
+    async def ensure(self, config: IndexConfig):
+        """Make sure the alias serves an index built with `config`, migrating if it differs."""
+        await self.refresh()
+        if self.active == config and await self._index_exists(self.alias):
+            return
+        await self.migrate(config)
+
+    async def ensure_ready(self, dim: int):
+        """Startup check that never runs a migration, so replicas become ready at once.
+
+        Creates the first index when none exists and fails if the stored dimension differs
+        from the model's. INDEX_* settings that differ from the stored config are only
+        reported; apply them with `python index_manager.py migrate`.
+        """
+        await self.refresh()
+        if self.pending is not None and not await self.redis.lock(self.lock_key).locked():
+            # Left behind by a migration whose process died; stop dual-writing its field
+            logger.warning(f"Clearing abandoned pending migration of {self.alias}: {self.pending.model_dump()}")
+            await self.redis.hdel(self.meta_key, "pending")
+            await self.refresh()
+        if self.active is None:
+            await self.migrate(IndexConfig.from_env(dim))
+            return
+        if self.active.dim != dim:
+            raise ValueError(
+                f"{self.alias} holds {self.active.dim}-dimensional vectors but the embedding model "
+                f"returns {dim}; re-embed the documents before switching models"
+            )
+        wanted = IndexConfig.from_env(dim, base=self.active)
+        if wanted != self.active:
+            logger.warning(
+                f"INDEX_* settings {wanted.model_dump()} differ from the active {self.alias} config "
+                f"{self.active.model_dump()}; run `python index_manager.py migrate` to apply them"
+            )
+
+    @asynccontextmanager
+    async def _migration_lock(self):
+        """Hold the migration lock, renewing its short TTL for as long as the migration runs."""
+        lock = self.redis.lock(self.lock_key, timeout=self.LOCK_TTL, blocking_timeout=3600)
+        async with lock:
+            renewer = asyncio.create_task(self._renew_lock(lock))
+            try:
+                yield
+            finally:
+                renewer.cancel()
+                await asyncio.gather(renewer, return_exceptions=True)
+
+    async def _renew_lock(self, lock):
+        while True:
+            await asyncio.sleep(self.LOCK_TTL / 3)
+            try:
+                await lock.reacquire()
+            except LockError as e:
+                logger.error(f"Lost the {self.alias} migration lock: {e}")
+                return
+
+    async def migrate(self, config: IndexConfig):
+        """Build an index for `config` and switch the alias to it.
+
+        The dimension cannot change: the backfill converts existing vectors between dtypes
+        but cannot re-embed them, so documents would silently drop out of the new index.
+        A new embedding model needs its documents re-embedded into a fresh key prefix.
+        """
+        async with self._migration_lock():
+            await self.refresh()
+            if self.active == config and await self._index_exists(self.alias):
+                return
+            if self.active is not None and self.active.dim != config.dim:
+                raise ValueError(
+                    f"{self.alias} holds {self.active.dim}-dimensional vectors; migrating to dim={config.dim} "
+                    f"requires re-embedding all documents"
+                )
+            previous_version, previous = self.version, self.active
+            version = (previous_version or 0) + 1
+            name = f"{self.alias}_v{version}"
+            logger.info(f"Migrating {self.alias} to {name}: {config.model_dump()}")
+
+            # Writers dual-write the new vector field while the backfill runs. Wait until every
+            # replica has seen `pending`, or documents they write during the scan would miss it.
+            await self.redis.hset(self.meta_key, "pending", config.model_dump_json())
+            self.pending = config
+            if previous is not None:
+                await asyncio.sleep(self.grace_seconds)
+            if await self._index_exists(name):
+                await self.redis.ft(name).dropindex(delete_documents=False)
+            await self.redis.ft(name).create_index(
+                fields=self.schema(config),
+                definition=IndexDefinition(prefix=[self.prefix], index_type=IndexType.HASH)
+            )
+            written = await self.backfill(config)
+            logger.info(f"Backfilled {written} documents into field '{config.vector_field}'")
+            await self._wait_indexed(name)
+            # Catch documents written while the first pass was scanning
+            written = await self.backfill(config)
+            if written:
+                logger.info(f"Backfilled {written} more documents before switching")
+                await self._wait_indexed(name)
+
+            if previous_version is not None:
+                await self.redis.ft(name).aliasupdate(self.alias)
+            else:
+                # First versioned index: a legacy index may still own the alias name
+                if await self._index_exists(self.alias):
+                    await self.redis.ft(self.alias).dropindex(delete_documents=False)
+                await self.redis.ft(name).aliasadd(self.alias)
+
+            # Keep the previous config as a write target so replicas still on the old index
+            # (and its vector field) see new documents until they refresh
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hset(self.meta_key, mapping={"version": version, "config": config.model_dump_json()})
+                if previous is not None:
+                    pipe.hset(self.meta_key, "previous", previous.model_dump_json())
+                pipe.hdel(self.meta_key, "pending")
+                await pipe.execute()
+            await self.refresh()
+            logger.info(f"{self.alias} now serves {name}")
+
+            if previous is None:
+                return
+            await asyncio.sleep(self.grace_seconds)
+            if previous_version is not None:
+                await self.redis.ft(f"{self.alias}_v{previous_version}").dropindex(delete_documents=False)
+            await self.redis.hdel(self.meta_key, "previous")
+            await self.refresh()
+            if previous.vector_field != config.vector_field:
+                # Wait for writers to stop filling the old field before removing it
+                await asyncio.sleep(self.grace_seconds)
+                await self._drop_field(previous.vector_field)
+            logger.info(f"Retired {self.alias}_v{previous_version}")
+
+    async def status(self) -> dict:
+        await self.refresh()
+        info = await self.redis.ft(self.alias).info() if await self._index_exists(self.alias) else {}
+        return {
+            "alias": self.alias,
+            "version": self.version,
+            "config": self.active.model_dump() if self.active else None,
+            "pending": self.pending.model_dump() if self.pending else None,
+            "previous": self.previous.model_dump() if self.previous else None,
+            "num_docs": int(info.get("num_docs", 0)) if info else 0,
+        }
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Manage the versioned chat history vector index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status")
+    migrate = sub.add_parser("migrate")
+    migrate.add_argument("--dim", type=int, help="defaults to the active index's dimension")
+    migrate.add_argument("--dtype", choices=sorted(VECTOR_FIELDS))
+    migrate.add_argument("--metric", choices=["COSINE", "IP", "L2"])
+    migrate.add_argument("--m", type=int)
+    migrate.add_argument("--ef-construction", type=int)
+    migrate.add_argument("--ef-runtime", type=int)
+    args = parser.parse_args()
+
+    redis_client = aioredis.from_url(os.getenv("REDIS_URL"))
+    manager = IndexManager(redis_client)
+    try:
+        if args.command == "migrate":
+            await manager.refresh()
+            dim = args.dim or (manager.active.dim if manager.active else int(os.getenv("DEFAULT_EMBED_DIM", 1024)))
+            config = IndexConfig.from_env(dim, base=manager.active)
+            overrides = {
+                "dtype": args.dtype, "metric": args.metric, "m": args.m,
+                "ef_construction": args.ef_construction, "ef_runtime": args.ef_runtime,
+            }
+            config = config.model_copy(update={k: v for k, v in overrides.items() if v is not None})
+            await manager.ensure(config)
+        print(json.dumps(await manager.status(), indent=2))
+    finally:
+        await redis_client.aclose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -1,111 +1,172 @@
 from fastapi import FastAPI
 from dotenv import load_dotenv
-import redis
-from redis import Redis
+import redis.asyncio as aioredis
+from redis.asyncio import Redis
 import os
 from fastapi import Depends
-from redis.commands.search.field import VectorField, TextField, TagField
-from redis.commands.search.index_definition import IndexDefinition, IndexType
 from redis.commands.search.query import Query
-import cohere
 import logging
-import numpy as np
-from preprocessing import preprocess_text
-from models import UpsertHistoryRequest, SimilaritySearchRequest
+import asyncio
+import re
+from datetime import datetime
+import preprocessing
+from preprocessing import preprocess_text_async, preprocess_texts_async, preprocess_executor
+from models import EmbedRequest, UpsertHistoryRequest, UpsertHistoryBatchRequest, SimilaritySearchRequest
 from contextlib import asynccontextmanager
+from embedding_cache import EmbeddingCache
+from embeddings import DEFAULT_EMBED_DIM, DOCUMENT_INPUT_TYPE, EmbeddingClient
+from index_manager import IndexManager
 
 logger = logging.getLogger(__name__)
 load_dotenv()
 REDIS_URL = os.getenv("REDIS_URL")
 INDEX_NAME = "Chatbot_Index"
-COHERE_API_KEY = os.getenv("COHERE_API_KEY")
-co = cohere.ClientV2(COHERE_API_KEY)
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", 10000))
+EMBED_CACHE_TTL = int(os.getenv("EMBED_CACHE_TTL", 7 * 86400))
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_index(redis_client)
+    await asyncio.get_running_loop().run_in_executor(preprocess_executor, preprocessing.warm_up)
+    await embedder.check_dimension(DEFAULT_EMBED_DIM)
+    await index_manager.ensure_ready(DEFAULT_EMBED_DIM)
     yield
+    await redis_client.aclose()
+    await pool.disconnect()
+    embedder.close()
+    preprocess_executor.shutdown(wait=False)
 
 app = FastAPI(lifespan=lifespan)
 
-# Set embedding dimension from environment or use default
-embedding_dim = int(os.getenv("DEFAULT_EMBED_DIM", 768))
-
-
-
-pool = redis.ConnectionPool.from_url(REDIS_URL, decode_responses=False)
+pool = aioredis.ConnectionPool.from_url(REDIS_URL, decode_responses=False, max_connections=REDIS_MAX_CONNECTIONS)
 redis_client = Redis(connection_pool=pool)
-
-try:
-    default_dim = int(os.getenv("DEFAULT_EMBED_DIM", 768))
-except Exception as e:
-    logger.warning(f"Could not determine embedding dimension from Cohere: {e}. Falling back to default embedding dimension: 768")
-    default_dim = 768
-embedding_dim = default_dim
-
-
-def create_index(r: Redis):
+embedding_cache = EmbeddingCache(redis_client, max_items=EMBED_CACHE_SIZE, ttl=EMBED_CACHE_TTL)
+embedder = EmbeddingClient(embedding_cache)
+index_manager = IndexManager(redis_client, alias=INDEX_NAME, prefix="doc:")
+
+
+def _kinds(targets: list) -> tuple:
+    return tuple(sorted({kind for _, _, kind in targets}))
+
+def _doc_key(item: UpsertHistoryRequest) -> str:
+    return f"doc:{item.user_id}_{item.timestamp}"
+
+def _doc_mapping(item: UpsertHistoryRequest, vectors: dict, targets: list) -> dict:
+    mapping = {
+        "user_id": item.user_id,
+        "message": item.message,
+        "response": item.response,
+        "timestamp": item.timestamp,
+        "role": item.role,
+    }
+    # One vector field per index version being served or built
+    for field, dtype, kind in targets:
+        mapping[field] = vectors[kind].astype(dtype).tobytes()
     try:
-        r.ft(INDEX_NAME).info()
-    except:
-        schema = [
-            TextField("user_id"),
-            TextField("message"),
-            TextField("response"),
-            TextField("timestamp"),
-            TagField("role"),
-            VectorField(
-                "embedding", "HNSW", {
-                    "TYPE": "FLOAT32",
-                    "DIM": embedding_dim,  # same as your Cohere dims
-                    "DISTANCE_METRIC": "COSINE"
-                }
-            )
-        ]
-        r.ft(INDEX_NAME).create_index(
-            fields=schema,
-            definition=IndexDefinition(prefix=["doc:"], index_type=IndexType.HASH)
-        )
+        # Numeric copy of the timestamp for time-window filters
+        mapping["ts"] = datetime.fromisoformat(item.timestamp).timestamp()
+    except ValueError:
+        pass
+    return mapping
+
+def _escape_tag(value: str) -> str:
+    return re.sub(r"([^\w])", r"\\\1", value)
+
+def _search_filter(request: SimilaritySearchRequest) -> str:
+    """Pre-filter for the KNN clause so only the matching subspace is searched."""
+    clauses = []
+    if request.user_id:
+        clauses.append(f"@user_id:{{{_escape_tag(request.user_id)}}}")
+    if request.role:
+        clauses.append(f"@role:{{{_escape_tag(request.role)}}}")
+    if request.since or request.until:
+        low = request.since.timestamp() if request.since else "-inf"
+        high = request.until.timestamp() if request.until else "+inf"
+        clauses.append(f"@ts:[{low} {high}]")
+    return f"({' '.join(clauses)})" if clauses else "*"
 
 @app.post("/upsert-history")
 async def upsert_history(request: UpsertHistoryRequest):
     text = f"{request.message} {request.response}"
-    preprocessed_text = preprocess_text(text)
-    embed_response = co.embed(texts=[preprocessed_text], model="embed-english-v3.0", input_type="search_document",embedding_types=["float"])
-
-    vector = embed_response.embeddings.embeddings[0]
-    vector_bytes = np.array(vector, dtype=np.float32).tobytes()
-    
-    key = f"doc:{request.user_id}_{request.timestamp}"
-    redis_client.hset(key, mapping={
-        "user_id": request.user_id,
-        "message": request.message,
-        "response": request.response,
-        "timestamp": request.timestamp,
-        "role": request.role,
-        "embedding": vector_bytes
-    })
+    preprocessed_text = await preprocess_text_async(text)
+    targets = await index_manager.write_targets()
+    embedded = await embedder.embed_documents([preprocessed_text], _kinds(targets))
+    vectors = {kind: values[0] for kind, values in embedded.items()}
+    await redis_client.hset(_doc_key(request), mapping=_doc_mapping(request, vectors, targets))
 
     return {"status": "success"}
 
+@app.post("/upsert-history/batch")
+async def upsert_history_batch(request: UpsertHistoryBatchRequest):
+    """Embed many interactions with as few embedding calls as possible and write them in one pipeline."""
+    items = request.items
+    if not items:
+        return {"status": "success", "count": 0}
+
+    texts = await preprocess_texts_async([f"{item.message} {item.response}" for item in items])
+    targets = await index_manager.write_targets()
+    embedded = await embedder.embed_documents(list(texts), _kinds(targets))
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for i, item in enumerate(items):
+            vectors = {kind: values[i] for kind, values in embedded.items()}
+            pipe.hset(_doc_key(item), mapping=_doc_mapping(item, vectors, targets))
+        await pipe.execute()
+
+    return {"status": "success", "count": len(items)}
+
 @app.post("/similarity-search")
 async def similarity_search(request: SimilaritySearchRequest):
-    preprocessed_query = preprocess_text(request.query)
-    embed_response = co.embed(texts=[preprocessed_query], model="embed-english-v3.0", input_type="search_document")
-    query_vector = np.array(embed_response.embeddings.float[0], dtype=np.float32).tobytes()
-    base_query = f'@role:{{{request.role}}}=>[KNN 5 @embedding $embedding]'
-    redis_query = Query(base_query).paging(0, 5).dialect(2).return_fields("user_id", "message", "response", "timestamp", "role", "__embedding_score")
-
-    results = redis_client.ft(INDEX_NAME).search(redis_query, query_params={
+    preprocessed_query = await preprocess_text_async(request.query)
+    await index_manager.write_targets()  # refreshes the active config when stale
+    config = index_manager.active
+    # The query vector must match the index's storage dtype
+    kind = config.embedding_kind
+    query_vector = (await embedder.embed_query(preprocessed_query, kind)).astype(config.numpy_dtype).tobytes()
+    base_query = f'{_search_filter(request)}=>[KNN {request.k} @{config.vector_field} $embedding AS score]'
+    redis_query = (
+        Query(base_query)
+        .sort_by("score")
+        .paging(0, request.k)
+        .dialect(2)
+        .return_fields("user_id", "message", "response", "timestamp", "role", "score")
+    )
+
+    results = await redis_client.ft(index_manager.active_index).search(redis_query, query_params={
         "embedding": query_vector
     })
 
-    return [
+    hits = [
         {
-            "message": getattr(r, "message", r.get("message", None)),
-            "response": getattr(r, "response", r.get("response", None)),
-            "user_id": getattr(r, "user_id", r.get("user_id", None))
+            "message": getattr(r, "message", None),
+            "response": getattr(r, "response", None),
+            "user_id": getattr(r, "user_id", None),
+            "timestamp": getattr(r, "timestamp", None),
+            "role": getattr(r, "role", None),
+            # Cosine distance -> similarity, higher is better
+            "score": 1 - float(getattr(r, "score", 1))
         }
         for r in results.docs
     ]
-
+    if request.min_score is not None:
+        hits = [hit for hit in hits if hit["score"] >= request.min_score]
+    return hits
+
+@app.post("/embed")
+async def embed(request: EmbedRequest):
+    """Embed raw (unpreprocessed) texts with the service's provider, for callers that keep their own vector indexes."""
+    embed_many = embedder.embed_documents if request.input_type == DOCUMENT_INPUT_TYPE else embedder.embed_queries
+    vectors = (await embed_many(request.texts))["float"]
+    return {
+        "model": embedder.model,
+        "dim": len(vectors[0]),
+        "embeddings": [vector.tolist() for vector in vectors],
+    }
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "preprocessing": preprocessing.stats(),
+        "index": await index_manager.status(),
+    }
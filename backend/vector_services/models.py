@@ -1,8 +1,15 @@
-from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, Field
 
 class SimilaritySearchRequest(BaseModel):
     query: str
-    role: str
+    role: Optional[str] = None
+    user_id: Optional[str] = None  # restrict the KNN to one user's documents
+    k: int = Field(default=5, ge=1, le=50)
+    min_score: Optional[float] = None  # minimum cosine similarity of returned hits
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
 
 class UpsertHistoryRequest(BaseModel):
     user_id: str
@@ -10,3 +17,10 @@ class UpsertHistoryRequest(BaseModel):
     response: str
     timestamp: str  # ISO format
     role: str = "user"  # Optional, default to 'user'
+
+class UpsertHistoryBatchRequest(BaseModel):
+    items: List[UpsertHistoryRequest] = Field(default_factory=list)
+
+class EmbedRequest(BaseModel):
+    texts: List[str] = Field(min_length=1, max_length=96)
+    input_type: str = "search_query"  # or "search_document"
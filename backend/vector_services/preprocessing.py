@@ -1,7 +1,71 @@
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
 import spacy
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "lemma": lemmatize and drop stop words/punctuation with only the spaCy components that needs
+# "none": pass text through unchanged, for embedding models that do better on raw text
+PREPROCESS_MODE = os.getenv("PREPROCESS_MODE", "lemma").lower()
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+PREPROCESS_CACHE_SIZE = int(os.getenv("PREPROCESS_CACHE_SIZE", 10000))
+# nlp.pipe settings for batches; n_process > 1 forks worker processes, worth it only for large batches
+PREPROCESS_BATCH_SIZE = int(os.getenv("PREPROCESS_BATCH_SIZE", 64))
+PREPROCESS_PROCESSES = int(os.getenv("PREPROCESS_PROCESSES", 1))
+# Bounded pool so CPU-bound spaCy work never runs on the event loop
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", 4))
+preprocess_executor = ThreadPoolExecutor(max_workers=PREPROCESS_WORKERS, thread_name_prefix="preprocess")
+
+# The rule-based lemmatizer only needs POS tags (tok2vec, tagger, attribute_ruler);
+# the dependency parser and NER are never loaded.
+LEMMA_EXCLUDE = ["parser", "ner", "senter"]
+
+_nlp = None
+_nlp_lock = threading.Lock()
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_cache_lock = threading.Lock()
+cache_hits = 0
+cache_misses = 0
+
+
+def get_nlp():
+    """Load the trimmed spaCy pipeline on first use."""
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                _nlp = spacy.load(SPACY_MODEL, exclude=LEMMA_EXCLUDE)
+    return _nlp
+
+
+def _lemmas(doc) -> str:
+    return " ".join(token.lemma_ for token in doc if not token.is_stop and not token.is_punct)
+
+
+def _cached(text: str):
+    global cache_hits, cache_misses
+    with _cache_lock:
+        value = _cache.get(text)
+        if value is None:
+            cache_misses += 1
+            return None
+        _cache.move_to_end(text)
+        cache_hits += 1
+        return value
 
-# Load the spaCy model
-nlp = spacy.load("en_core_web_sm")
+
+def _remember(text: str, value: str):
+    with _cache_lock:
+        _cache[text] = value
+        _cache.move_to_end(text)
+        while len(_cache) > PREPROCESS_CACHE_SIZE:
+            _cache.popitem(last=False)
 
 
 def preprocess_text(text):
@@ -9,6 +73,52 @@ def preprocess_text(text):
     Preprocess the input text using spaCy.
     This function tokenizes the text, removes stop words and punctuation, and lemmatizes the tokens.
     """
-    doc = nlp(text)
-    tokens = [token.lemma_ for token in doc if not token.is_stop and not token.is_punct]
-    return " ".join(tokens)
\ No newline at end of file
+    return preprocess_texts([text])[0]
+
+
+def preprocess_texts(texts: List[str]) -> List[str]:
+    """Preprocess many texts, serving repeats from the LRU and running the rest through one nlp.pipe."""
+    if PREPROCESS_MODE == "none":
+        return list(texts)
+    results = [_cached(text) for text in texts]
+    missing = list(dict.fromkeys(text for text, result in zip(texts, results) if result is None))
+    if missing:
+        n_process = PREPROCESS_PROCESSES if len(missing) >= PREPROCESS_BATCH_SIZE else 1
+        docs = get_nlp().pipe(missing, batch_size=PREPROCESS_BATCH_SIZE, n_process=n_process)
+        processed = dict(zip(missing, (_lemmas(doc) for doc in docs)))
+        for text, value in processed.items():
+            _remember(text, value)
+        results = [processed[text] if result is None else result for text, result in zip(texts, results)]
+    return results
+
+
+async def preprocess_text_async(text):
+    """Run preprocess_text on the bounded worker pool without blocking the event loop."""
+    if PREPROCESS_MODE == "none":
+        return text
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(preprocess_executor, preprocess_text, text)
+
+
+async def preprocess_texts_async(texts: List[str]) -> List[str]:
+    if PREPROCESS_MODE == "none":
+        return list(texts)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(preprocess_executor, preprocess_texts, texts)
+
+
+def warm_up():
+    """Load the pipeline ahead of the first request when preprocessing is enabled."""
+    if PREPROCESS_MODE != "none":
+        get_nlp()
+
+
+def stats() -> dict:
+    lookups = cache_hits + cache_misses
+    return {
+        "mode": PREPROCESS_MODE,
+        "cache_hits": cache_hits,
+        "cache_misses": cache_misses,
+        "hit_rate": cache_hits / lookups if lookups else 0.0,
+        "cache_size": len(_cache),
+    }
@@ -22,6 +22,23 @@ def test_upsert_history():
     assert response.status_code == 200
     assert response.json()["status"] == "success"
 
+def test_upsert_history_batch():
+    test_data = {
+        "items": [
+            {
+                "user_id": "test_user",
+                "message": f"Batch question {i}",
+                "response": f"Batch answer {i}",
+                "timestamp": f"2025-07-09T12:0{i}:00",
+                "role": "user"
+            }
+            for i in range(3)
+        ]
+    }
+    response = client.post("/upsert-history/batch", json=test_data)
+    assert response.status_code == 200
+    assert response.json()["count"] == 3
+
 def test_similarity_search():
     time.sleep(1)
     search_data = {
@@ -31,3 +48,76 @@ def test_similarity_search():
     response = client.post("/similarity-search", json=search_data)
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+
+def test_similarity_search_scoped_to_user():
+    search_data = {
+        "query": "How is the weather?",
+        "user_id": "test_user",
+        "k": 3,
+        "min_score": 0.0
+    }
+    response = client.post("/similarity-search", json=search_data)
+    assert response.status_code == 200
+    results = response.json()
+    assert len(results) <= 3
+    assert all(r["user_id"] == "test_user" for r in results)
+
+def test_embed():
+    response = client.post("/embed", json={"texts": ["hello", "hi there"]})
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["embeddings"]) == 2
+    assert all(len(vector) == body["dim"] for vector in body["embeddings"])
+
+
+def test_embedding_client_with_custom_provider():
+    import asyncio
+    import numpy as np
+    from embeddings import EmbeddingClient, EmbeddingProvider
+
+    class FakeCache:
+        def __init__(self):
+            self.vectors = {}
+
+        async def get_many(self, model, input_type, texts, kind):
+            return [self.vectors.get((model, input_type, text, kind)) for text in texts]
+
+        async def set_many(self, model, input_type, texts, vectors, kind):
+            for text, vector in zip(texts, vectors):
+                self.vectors[(model, input_type, text, kind)] = vector
+
+    class FakeProvider(EmbeddingProvider):
+        model = "fake"
+        batch_size = 2
+
+        def __init__(self):
+            self.calls = []
+
+        async def embed(self, texts, input_type, kinds):
+            self.calls.append(list(texts))
+            return {kind: [np.full(4, len(text), dtype=np.float32) for text in texts] for kind in kinds}
+
+    class Incomplete(EmbeddingProvider):
+        model = "incomplete"
+        batch_size = 1
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+    provider = FakeProvider()
+    client = EmbeddingClient(FakeCache(), provider)
+    vectors = asyncio.run(client.embed_documents(["a", "bb", "ccc"]))["float"]
+    assert [int(v[0]) for v in vectors] == [1, 2, 3]
+    assert provider.calls == [["a", "bb"], ["ccc"]]
+    asyncio.run(client.embed_documents(["bb"]))
+    assert len(provider.calls) == 2  # served from the cache
+
+
+def test_cohere_embeddings_parsed_by_wire_name():
+    from cohere import EmbedByTypeResponseEmbeddings
+    from embeddings import CohereProvider
+
+    embeddings = EmbedByTypeResponseEmbeddings.model_validate({"float": [[0.5, -0.5]], "int8": [[64, -64]]})
+    vectors = CohereProvider._parse(embeddings, ("float", "int8"))
+    assert vectors["float"][0].tolist() == [0.5, -0.5]
+    assert vectors["int8"][0].tolist() == [64, -64]